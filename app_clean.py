@@ -1,31 +1,178 @@
 import os
+import sys
 import socket
 import math
 import json
 import shutil
+import tarfile
+import zipfile
+import re
+import hashlib
+import hmac
+import base64
+import bisect
+import ctypes
+import ctypes.util
+import struct
+import threading
+import tempfile
+import contextlib
+import subprocess
+import wave
+import time
+import uuid
 import psutil
 import platform
-from datetime import datetime
-from flask import Flask, request, send_from_directory, jsonify, render_template_string, Response, redirect, url_for
+import concurrent.futures
+import multiprocessing
+import mimetypes
+import unicodedata
+from urllib.parse import quote
+from datetime import datetime, timezone
+from flask import Flask, Request, request, send_file, abort, jsonify, render_template_string, Response, redirect, url_for
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from werkzeug.http import is_resource_modified
 import qrcode
+from PIL import Image, ImageOps, features
+import zlib
+import mmap
 from io import BytesIO
+from collections import OrderedDict, deque
+try:
+    import zstandard  # Opcionális: zstd tömörítés
+except ImportError:
+    zstandard = None
+try:
+    import brotli  # Opcionális: brotli tömörítés
+except ImportError:
+    brotli = None
 
 # --- Konfiguráció ---
 UPLOAD_FOLDER = 'uploads'
 DATA_FOLDER = 'data'
 NOTES_FILE = os.path.join(DATA_FOLDER, 'notes.json')
 SAVED_NOTES_FILE = os.path.join(DATA_FOLDER, 'saved_notes.json')
+STAGING_FOLDER = os.path.join(UPLOAD_FOLDER, '.staging')  # Folyamatban lévő darabolt feltöltések
+BLOBS_FOLDER = os.path.join(UPLOAD_FOLDER, '.blobs')  # Deduplikált tartalom (hash szerint)
+BLOB_INDEX_FILE = os.path.join(DATA_FOLDER, 'blob_index.json')
+HASH_INDEX_FILE = os.path.join(DATA_FOLDER, 'hash_index.json')
+JOBS_FILE = os.path.join(DATA_FOLDER, 'jobs.json')
 PORT = 5000
 
+# Szerver mód: 'threading' (Werkzeug fejlesztői szerver) vagy 'gevent' (éles üzem: szálak helyett
+# greenletek, zero-copy sendfile letöltés). Felülírható: --server <mód> vagy DROPFLOW_SERVER
+SERVER_MODE = os.environ.get('DROPFLOW_SERVER', 'threading')
+for i, arg in enumerate(sys.argv[1:], 1):
+    if arg.startswith('--server='):
+        SERVER_MODE = arg.split('=', 1)[1]
+    elif arg == '--server' and i + 1 < len(sys.argv):
+        SERVER_MODE = sys.argv[i + 1]
+
+# Darabolt (folytatható) feltöltés beállításai
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB darabok
+CHUNKED_UPLOAD_THRESHOLD = 64 * 1024 * 1024  # E méret felett a kliens darabolva tölt fel
+UPLOAD_PARALLEL_STREAMS = 4  # Egy fájl ennyi párhuzamos kapcsolaton érkezik darabolt feltöltéskor
+
+# Csomagolt (tar) feltöltés sok kis fájlhoz
+BATCH_UPLOAD_MIN_FILES = 10  # Legalább ennyi kis fájl esetén a kliens egy tar folyamba csomagol
+BATCH_UPLOAD_MAX_FILE_SIZE = 4 * 1024 * 1024  # Ennél nagyobb fájl külön kérésben megy
+BATCH_UPLOAD_MAX_BYTES = 256 * 1024 * 1024  # Egy csomag (kérés) maximális mérete
+UPLOAD_SESSION_TTL = 24 * 60 * 60  # Ennyi inaktivitás után töröljük a félbehagyott feltöltést
+UPLOAD_MAX_SESSIONS_PER_CLIENT = 16  # Ennyi befejezetlen darabolt feltöltése lehet egyszerre egy kliensnek (IP)
+UPLOAD_CLEANUP_INTERVAL = 15 * 60  # Takarítás gyakorisága (másodperc)
+
+# Tartalom-alapú tárolás: azonos tartalom csak egyszer foglal helyet (hard linkekkel)
+DEDUP_STORAGE = False
+PRECHECK_MAX_SIZE = 1024 * 1024 * 1024  # A kliens eddig a méretig hash-el feltöltés előtt
+PRECHECK_MAX_BATCH = 10000  # Egy /api/files/precheck kérésben ellenőrizhető fájlok száma
+HASH_INDEX_FLUSH_INTERVAL = 5  # A hash index lemezre írásának gyakorisága (másodperc)
+
+# Feltöltések tartóssága: 'none' (az operációs rendszerre bízzuk), 'fsync' (fájl fsync lezáráskor),
+# 'fsync_dir' (fsync + a könyvtár fsync-je az átnevezés után, áramszünet után is megmarad a név)
+UPLOAD_DURABILITY = 'fsync'
+UPLOAD_WRITE_BUFFER = 1024 * 1024  # Írási puffer és olvasási blokkméret feltöltéskor (bájt)
+
+# Feltöltés utáni háttérfeldolgozás (folyamatkészlet)
+JOB_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Párhuzamos feldolgozó folyamatok száma
+JOB_HISTORY_SIZE = 200  # Ennyi befejezett feladatot mutat a /api/jobs
+
+# Letöltések (ETag, tartománykérések)
+ETAG_SYNC_HASH_MAX = 16 * 1024 * 1024  # E méretig az ETag-hez szükséges hash azonnal kiszámolódik
+DOWNLOAD_MAX_RANGES = 64  # Ennél több tartományt kérő Range fejlécet figyelmen kívül hagyunk
+ZIP_STREAM_BLOCK = 1024 * 1024  # Tömeges ZIP letöltésnél egyszerre olvasott blokk mérete
+
+# Tömörített válaszok (gzip / zstd / brotli, amit a kliens és a szerver is ismer)
+COMPRESS_MIN_SIZE = 1024  # Ennél kisebb választ nem érdemes tömöríteni
+COMPRESS_JSON_MIN_SIZE = 16 * 1024  # E fölött a JSON válaszok folyamként tömörítve mennek ki
+COMPRESS_CACHE_MAX_FILE = 16 * 1024 * 1024  # E méretig a tömörített fájlváltozat a gyorsítótárba kerül
+COMPRESS_CACHE_MAX_BYTES = 128 * 1024 * 1024  # A tömörített változatok gyorsítótárának kerete
+COMPRESSIBLE_EXTENSIONS = ('svg', 'csv', 'tsv', 'yaml', 'yml', 'toml', 'ini', 'conf')  # A 'code' típusokon felül
+
+# Sávszélesség-korlátozás (bájt/másodperc, 0 = korlátlan); futás közben a /api/admin/bandwidth állítja
+BANDWIDTH_GLOBAL_LIMIT = 0  # Az összes letöltés és feltöltés együtt
+BANDWIDTH_CLIENT_LIMIT = 0  # Kliens IP-címenként
+BANDWIDTH_QUANTUM = 64 * 1024  # Ekkora szeletekben osztjuk a sávszélességet az átvitelek között
+ADMIN_TOKEN = os.environ.get('DROPFLOW_ADMIN_TOKEN')  # Admin API távoli eléréshez (X-Admin-Token fejléc)
+
+# Memóriában tartott fájlindex
+FILE_INDEX_POLL_INTERVAL = 5  # Újraolvasás gyakorisága, ha nincs inotify (másodperc)
+FILE_EVENT_WINDOW = 0.1  # Ennyi ideig gyűjtjük a fájlváltozásokat egy Socket.IO üzenetbe (másodperc)
+FILE_JOURNAL_SIZE = 10000  # Ennyi változást őrzünk a ?since= különbséglekérdezésekhez
+FILE_PAGE_SIZE = 200  # Fájllista oldalmérete lapozásnál (alapértelmezés)
+FILE_PAGE_MAX = 1000  # Legnagyobb kérhető oldalméret
+FILE_PAGE_SCAN_LIMIT = 20000  # Névszűrésnél egy oldal legfeljebb ennyi bejegyzést vizsgál
+
+# Bélyegképek (Pillow); a lemezes gyorsítótár a DATA_FOLDER alatt van
+THUMB_CACHE_FOLDER = os.path.join(DATA_FOLDER, 'cache', 'thumbs')
+THUMB_WIDTHS = (160, 320, 640)  # Méretlépcsők; a kért szélesség a következő lépcsőre kerekedik
+THUMB_PREGENERATE_WIDTH = 320  # Feltöltés után ez a méret készül el előre (rácsnézet, 2x kijelző)
+PREVIEW_WIDTHS = (640, 1280, 1920, 2560)  # Az előnézet képernyőméretű változatai (srcset)
+THUMB_QUALITY = 80  # WebP/JPEG minőség
+THUMB_CACHE_MAX_BYTES = 256 * 1024 * 1024  # A lemezes gyorsítótár kerete; fölötte a legrégebben használt törlődik
+
+# Hangfájlok hullámformája (előre számolt csúcsértékek a WaveSurfer-nek)
+PEAKS_CACHE_FOLDER = os.path.join(DATA_FOLDER, 'cache', 'peaks')
+PEAKS_POINTS = 4000  # Ennyi csúcsérték jut egy fájlra, a hosszától függetlenül
+PEAKS_BLOCKS_PER_SECOND = 100  # Első lépésben 10 ms-os blokkok csúcsait gyűjtjük
+PEAKS_DECODE_RATE = 8000  # Külső dekóderrel (ffmpeg) ekkora mintavételre és monóra alakítunk
+PEAKS_SYNC_MAX = 32 * 1024 * 1024  # E méretig kérésre azonnal számolunk, fölötte háttérfeladat készíti
+FFMPEG_PATH = shutil.which('ffmpeg')  # Nem WAV formátumokhoz; ha nincs, ezekhez nem készül hullámforma
+
+# Szöveges előnézet soronként (ritka sorindex + mmap, így a több GB-os naplók is görgethetők)
+LINE_INDEX_STEP = 64 * 1024  # Nagyjából ennyi bájtonként jegyzünk fel egy sorkezdetet
+LINE_INDEX_CACHE_SIZE = 64  # Ennyi fájl sorindexét tartjuk memóriában (LRU)
+PREVIEW_WINDOW_LINES = 200  # Egy ablak alapértelmezett sorszáma
+PREVIEW_MAX_LINES = 1000  # Egy kérésben legfeljebb ennyi sor
+PREVIEW_LINE_MAX_BYTES = 2000  # Ennél hosszabb sorokból csak az eleje kerül a válaszba
+
+# Növekvő (napló)fájlok élő követése Socket.IO-n
+TAIL_WAKE_INTERVAL = 0.1  # Ilyen gyakran nézzük meg az inotify által jelzett fájlokat
+TAIL_POLL_INTERVAL = 1  # Jelzés nélkül (vagy inotify híján) ennyi másodpercenként ellenőrzünk minden követett fájlt
+TAIL_MAX_BACKLOG = 1024 * 1024  # Ennél nagyobb hozzáírást nem küldünk ki, a kliens újratölti az ablakot
+
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 * 1024  # 16 GB max méret
 app.config['SECRET_KEY'] = 'dropflow-chat-secret-key'
 
 # SocketIO inicializálása
-socketio = SocketIO(app, cors_allowed_origins="*", logger=False, engineio_logger=False)
+if SERVER_MODE not in ('threading', 'gevent'):
+    raise SystemExit(f"Ismeretlen szerver mód: {SERVER_MODE} (lehetséges: threading, gevent)")
+if SERVER_MODE == 'gevent':
+    try:
+        import gevent
+    except ImportError:
+        raise SystemExit("A gevent szerver módhoz telepítsd a gevent csomagot: pip install gevent")
+socketio = SocketIO(app, async_mode=SERVER_MODE, cors_allowed_origins="*", logger=False, engineio_logger=False)
+
+def run_blocking(func, *args):
+    """Runs CPU- or disk-heavy request work; in gevent mode on the hub's thread pool, so the
+    single (unpatched) hub keeps serving the other connections meanwhile"""
+    if SERVER_MODE == 'gevent':
+        return gevent.get_hub().threadpool.spawn(func, *args).get()
+    return func(*args)
 
 # Chat üzenetek tárolása (memóriában)
 chat_messages = []
@@ -106,34 +253,25 @@ def get_storage_info():
         return None
 
 def get_upload_folder_info():
-    """Returns information about the upload folder"""
+    """Returns information about the upload folder (logical and physical size)"""
     try:
-        if not os.path.exists(UPLOAD_FOLDER):
-            return {'size': 0, 'count': 0, 'size_formatted': '0 B'}
-        
-        total_size = 0
-        file_count = 0
-        
-        for filename in os.listdir(UPLOAD_FOLDER):
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            if os.path.isfile(filepath):
-                total_size += os.path.getsize(filepath)
-                file_count += 1
-        
-        return {
-            'size': total_size,
-            'count': file_count,
-            'size_formatted': format_bytes(total_size)
-        }
-    except:
-        return {'size': 0, 'count': 0, 'size_formatted': '0 B'}
+        summary = file_index.summary()
+    except OSError:
+        summary = {'count': 0, 'total_size': 0, 'physical_size': 0}
+    return {
+        'size': summary['total_size'],
+        'count': summary['count'],
+        'size_formatted': format_bytes(summary['total_size']),
+        'physical_size': summary['physical_size'],
+        'physical_size_formatted': format_bytes(summary['physical_size'])
+    }
 
 def get_system_info():
     """Returns basic system information"""
     try:
         return {
             'platform': platform.system(),
-            'cpu_percent': psutil.cpu_percent(interval=1),
+            'cpu_percent': psutil.cpu_percent(interval=None),  # Az előző hívás óta mért érték, nem blokkol
             'memory_percent': psutil.virtual_memory().percent,
             'uptime': datetime.now().strftime('%H:%M:%S')
         }
@@ -160,6 +298,8 @@ def format_bytes(size):
     size_name = ("B", "KB", "MB", "GB", "TB"); i = int(math.floor(math.log(size, 1024)))
     p = math.pow(1024, i); s = round(size / p, 2); return f"{s} {size_name[i]}"
 
+PREVIEW_TYPES = ('image', 'video', 'audio', 'pdf', 'code', 'other')  # get_file_info lehetséges típusai
+
 def get_file_info(filename):
     ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
     info = {
@@ -189,6 +329,1830 @@ def get_file_info(filename):
     return preview_type, icon
 
 
+# --- Fájlindex (memóriában) ---
+
+class FileIndex:
+    """In-memory listing of UPLOAD_FOLDER with precomputed entries and running totals.
+
+    Built once, then kept current by our own write/delete paths and by a
+    watcher (inotify on Linux, periodic rescan elsewhere), so listing requests
+    never touch the disk. Hidden names (.staging, .blobs) are not listed.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.RLock()
+        self.entries = {}  # név -> a listázó API-k által visszaadott adatok
+        self.keys = {}  # név -> (st_dev, st_ino)
+        self.inodes = {}  # (st_dev, st_ino) -> [méret, hivatkozások]; a hard linkek egyszer számítanak
+        self.total_size = 0
+        self.physical_size = 0
+        self.last_modified = 0
+        # Változás-sorszám: ezredmásodperces kezdőérték, így újraindítás után sem ismétlődik
+        self.version = int(time.time() * 1000)
+        self.journal = deque(maxlen=FILE_JOURNAL_SIZE)  # (verzió, típus, név)
+        self.journal_floor = self.version  # Ennél régebbi verzióból nem lehet különbséget adni
+        self.loaded = False
+        self.payload_cache = (None, None)  # (verzió, /api/files JSON)
+        self.views = {}  # (rendezés, típus vagy None) -> rendezett kulcslista; első használatkor épül
+
+    @staticmethod
+    def make_entry(name, stat):
+        preview_type, icon = get_file_info(name)
+        return {
+            'name': name,
+            'size': stat.st_size,
+            'size_formatted': format_bytes(stat.st_size),
+            'date': stat.st_mtime,
+            'date_formatted': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M'),
+            'preview_type': preview_type,
+            'icon': icon
+        }
+
+    # Rendezési kulcsok; a név mindig az utolsó elem, így a kulcsok egyediek és kurzorként is használhatók
+    SORT_KEYS = {
+        'name': lambda e: (e['name'].lower(), e['name']),
+        'size': lambda e: (e['size'], e['name'].lower(), e['name']),
+        'date': lambda e: (e['date'], e['name'].lower(), e['name']),
+        'type': lambda e: (e['preview_type'], e['name'].lower(), e['name'])
+    }
+
+    def ensure_loaded(self):
+        with self.lock:
+            if not self.loaded:
+                self.rescan()
+                self.loaded = True
+
+    def _add(self, name, stat):
+        key = (stat.st_dev, stat.st_ino)
+        entry = self.entries[name] = self.make_entry(name, stat)
+        for (sort, preview_type), view in self.views.items():
+            if preview_type in (None, entry['preview_type']):
+                bisect.insort(view, self.SORT_KEYS[sort](entry))
+        self.keys[name] = key
+        self.total_size += stat.st_size
+        inode = self.inodes.get(key)
+        if inode:
+            inode[1] += 1
+        else:
+            self.inodes[key] = [stat.st_size, 1]
+            self.physical_size += stat.st_size
+        self.last_modified = max(self.last_modified, stat.st_mtime)
+
+    def _discard(self, name):
+        entry = self.entries.pop(name, None)
+        if entry is None:
+            return False
+        for (sort, preview_type), view in self.views.items():
+            if preview_type in (None, entry['preview_type']):
+                sort_key = self.SORT_KEYS[sort](entry)
+                del view[bisect.bisect_left(view, sort_key)]
+        key = self.keys.pop(name)
+        self.total_size -= entry['size']
+        inode = self.inodes[key]
+        inode[1] -= 1
+        if not inode[1]:
+            del self.inodes[key]
+            self.physical_size -= inode[0]
+        return True
+
+    def _commit(self, changes):
+        """Bumps the version once for a set of (type, name) changes and journals them"""
+        if not changes:
+            return False
+        self.version += 1
+        for change_type, name in changes:
+            if len(self.journal) == self.journal.maxlen:
+                self.journal_floor = self.journal[0][0]
+            self.journal.append((self.version, change_type, name))
+        return True
+
+    def changes_since(self, since):
+        """Net changes after version `since` as (version, changes), or (version, None)
+        when the journal no longer reaches back that far and a full resync is needed"""
+        self.ensure_loaded()
+        with self.lock:
+            if since < self.journal_floor or since > self.version:
+                return self.version, None
+            # Névenként csak a végállapot számít; az első bejegyzés mutatja, létezett-e `since`-kor
+            existed = OrderedDict()
+            for version, change_type, name in reversed(self.journal):
+                if version <= since:
+                    break
+                existed[name] = change_type != 'added'
+            changes = []
+            for name, was_present in reversed(existed.items()):
+                entry = self.entries.get(name)
+                if entry is not None:
+                    changes.append({'type': 'modified' if was_present else 'added', 'name': name, 'file': entry})
+                elif was_present:
+                    changes.append({'type': 'removed', 'name': name})
+            return self.version, changes
+
+    def refresh(self, name):
+        """Re-stats one name; adds, updates or drops its entry. Returns True if anything changed"""
+        if not name or name.startswith('.') or '/' in name:
+            return False
+        try:
+            stat = os.stat(os.path.join(self.folder, name))
+            is_file = os.path.isfile(os.path.join(self.folder, name))
+        except OSError:
+            stat, is_file = None, False
+        with self.lock:
+            if not self.loaded:
+                return False  # Az első beolvasás úgyis látni fogja
+            entry = self.entries.get(name)
+            if is_file and entry and entry['size'] == stat.st_size and entry['date'] == stat.st_mtime \
+                    and self.keys[name] == (stat.st_dev, stat.st_ino):
+                return False
+            existed = self._discard(name)
+            if is_file:
+                self._add(name, stat)
+                return self._commit([('modified' if existed else 'added', name)])
+            return self._commit([('removed', name)] if existed else [])
+
+    def remove(self, name):
+        with self.lock:
+            if self._discard(name):
+                self._commit([('removed', name)])
+
+    def rescan(self):
+        """Full rescan; applies only the differences. Used at startup, by the polling
+        watcher and after an inotify queue overflow"""
+        seen = {}
+        with os.scandir(self.folder) as it:
+            for dir_entry in it:
+                if not dir_entry.name.startswith('.') and dir_entry.is_file():
+                    seen[dir_entry.name] = dir_entry.stat()
+        with self.lock:
+            changes = []
+            for name in list(self.entries):
+                if name not in seen:
+                    self._discard(name)
+                    changes.append(('removed', name))
+            for name, stat in seen.items():
+                entry = self.entries.get(name)
+                if entry and entry['size'] == stat.st_size and entry['date'] == stat.st_mtime:
+                    continue
+                existed = self._discard(name)
+                self._add(name, stat)
+                changes.append(('modified' if existed else 'added', name))
+            return self._commit(changes)
+
+    def files(self):
+        self.ensure_loaded()
+        with self.lock:
+            return list(self.entries.values())
+
+    def summary(self):
+        self.ensure_loaded()
+        with self.lock:
+            return {
+                'count': len(self.entries),
+                'total_size': self.total_size,
+                'physical_size': self.physical_size,
+                'last_modified': self.last_modified,
+                'version': self.version
+            }
+
+    def _view(self, sort, preview_type):
+        # Nézet csak a rögzített típusokra épül, különben tetszőleges type= értékek halmoznák a nézeteket
+        if preview_type is not None and preview_type not in PREVIEW_TYPES:
+            raise ValueError('Invalid type')
+        view = self.views.get((sort, preview_type))
+        if view is None:
+            sort_key = self.SORT_KEYS[sort]
+            view = self.views[(sort, preview_type)] = sorted(
+                sort_key(entry) for entry in self.entries.values()
+                if preview_type in (None, entry['preview_type']))
+        return view
+
+    def query(self, sort='date', descending=True, search=None, preview_type=None, cursor=None, limit=FILE_PAGE_SIZE):
+        """One page of the listing from a presorted view.
+
+        cursor is the sort key of the last entry already seen (see encode_file_cursor); the
+        page starts right after it with a binary search, so a page costs O(log n + limit).
+        A name filter may skip entries; at most FILE_PAGE_SCAN_LIMIT are examined per page.
+        """
+        self.ensure_loaded()
+        search = search.lower() if search else None
+        with self.lock:
+            view = self._view(sort, preview_type)
+            if cursor is None:
+                index = len(view) - 1 if descending else 0
+            else:
+                index = bisect.bisect_left(view, cursor) - 1 if descending else bisect.bisect_right(view, cursor)
+            step = -1 if descending else 1
+            page, last, scanned = [], None, 0
+            while 0 <= index < len(view) and len(page) < limit and scanned < FILE_PAGE_SCAN_LIMIT:
+                last = view[index]
+                if not search or search in last[-1].lower():
+                    page.append(self.entries[last[-1]])
+                index += step
+                scanned += 1
+            return {
+                'files': page,
+                'next_cursor': last if 0 <= index < len(view) else None,
+                'matched': None if search else len(view),
+                'count': len(self.entries),
+                'total_size': self.total_size,
+                'version': self.version
+            }
+
+    def matching_names(self, search=None, preview_type=None):
+        """Every name passing the listing filters, in name order"""
+        self.ensure_loaded()
+        search = search.lower() if search else None
+        with self.lock:
+            return [key[-1] for key in self._view('name', preview_type)
+                    if not search or search in key[-1].lower()]
+
+    def files_payload(self):
+        """/api/files JSON, serialized once per index version"""
+        self.ensure_loaded()
+        with self.lock:
+            version, payload = self.payload_cache
+            if version != self.version:
+                payload = json.dumps({
+                    'files': list(self.entries.values()),
+                    'count': len(self.entries),
+                    'total_size': self.total_size,
+                    'version': self.version
+                })
+                self.payload_cache = (self.version, payload)
+            return payload
+
+file_index = FileIndex(UPLOAD_FOLDER)
+
+def encode_file_cursor(sort_key):
+    return base64.urlsafe_b64encode(json.dumps(sort_key).encode()).decode().rstrip('=')
+
+def decode_file_cursor(cursor, sort):
+    """Turns an opaque page cursor back into a sort key; ValueError if it does not fit the sort"""
+    try:
+        sort_key = tuple(json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    expected = FileIndex.SORT_KEYS[sort]({'name': '', 'size': 0, 'date': 0.0, 'preview_type': ''})
+    if len(sort_key) != len(expected) or not all(
+            isinstance(value, str) == isinstance(sample, str) and isinstance(value, (str, int, float))
+            for value, sample in zip(sort_key, expected)):
+        raise ValueError('Invalid cursor')
+    return sort_key
+
+# inotify konstansok (linux/inotify.h)
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x002, 0x004, 0x008
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x040, 0x080, 0x100, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW = 0x400, 0x800, 0x4000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+def open_inotify(folder):
+    """inotify descriptor watching folder, or None where inotify is unavailable"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+        if libc.inotify_add_watch(fd, os.fsencode(os.path.abspath(folder)), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+def read_inotify_names(fd):
+    """Drains pending events; returns the changed names, or None if a full rescan is needed"""
+    names = set()
+    while True:
+        try:
+            buffer = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                return None
+            if length:
+                names.add(os.fsdecode(buffer[offset:offset + length].rstrip(b'\0')))
+            offset += length
+
+def file_index_watcher():
+    """Háttérfeladat: a fájlindexet az inotify eseményei (vagy időszakos újraolvasás) alapján frissíti"""
+    file_index.ensure_loaded()
+    fd = open_inotify(UPLOAD_FOLDER)
+    if fd is None:
+        print('inotify nem elérhető, a fájlindex időszakos újraolvasással frissül')
+    while True:
+        try:
+            if fd is None:
+                socketio.sleep(FILE_INDEX_POLL_INTERVAL)
+                file_index.rescan()
+                continue
+            socketio.sleep(0.2)  # Az írások okozta eseményáradatot kötegelve dolgozzuk fel
+            names = read_inotify_names(fd)
+            if names is None:
+                file_index.rescan()
+            else:
+                for name in names:
+                    file_index.refresh(name)
+            wake_tail_readers(names)
+        except Exception as e:
+            print(f'Hiba a fájlindex frissítésekor: {e}')
+
+FILE_EVENTS = {'added': 'file_added', 'removed': 'file_removed', 'modified': 'file_modified'}
+file_events_held = 0  # Futó kötegelt feltöltések száma; közben a változások csak gyűlnek
+file_events_held_lock = threading.Lock()
+
+@contextlib.contextmanager
+def hold_file_events():
+    """Defers file events until the block ends (even on error), so a whole batch goes out as one files_changed"""
+    global file_events_held
+    with file_events_held_lock:
+        file_events_held += 1
+    try:
+        yield
+    finally:
+        with file_events_held_lock:
+            file_events_held -= 1
+
+def file_events_worker():
+    """Háttérfeladat: a fájlindex változásait Socket.IO eseményként küldi ki.
+
+    A rövid gyűjtési ablakban érkező változások (pl. egy tar csomag kicsomagolása)
+    egyetlen files_changed eseménybe kerülnek, egyedi változás saját eseményt kap.
+    Minden esemény hordozza az előző verziót (since), így a kliens észreveszi, ha lemaradt.
+    """
+    file_index.ensure_loaded()
+    last_version = file_index.version
+    while True:
+        socketio.sleep(FILE_EVENT_WINDOW)
+        if file_events_held:
+            continue  # A köteg végén a teljes különbség egyszerre megy ki
+        try:
+            version, changes = file_index.changes_since(last_version)
+            if changes == []:
+                continue
+            summary = file_index.summary()
+            # Az összesítők is mennek, mert lapozásnál a kliens nem látja a teljes listát
+            payload = {'since': last_version, 'version': version,
+                       'count': summary['count'], 'total_size': summary['total_size']}
+            if changes is None:
+                socketio.emit('files_changed', dict(payload, resync=True))
+            elif len(changes) == 1:
+                socketio.emit(FILE_EVENTS[changes[0]['type']], dict(changes[0], **payload))
+            else:
+                socketio.emit('files_changed', dict(payload, changes=changes))
+            last_version = version
+        except Exception as e:
+            print(f'Hiba a fájlváltozások küldésekor: {e}')
+
+# --- Darabolt (folytatható) feltöltés ---
+
+UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+def get_upload_session_dir(upload_id):
+    """Returns the staging directory of an upload session, or None for invalid ids"""
+    if not upload_id or not UPLOAD_ID_RE.match(upload_id):
+        return None
+    return os.path.join(STAGING_FOLDER, upload_id)
+
+def load_upload_session(upload_id):
+    """Betölti a feltöltési munkamenet adatait a staging mappából"""
+    session_dir = get_upload_session_dir(upload_id)
+    if not session_dir:
+        return None
+    try:
+        with open(os.path.join(session_dir, 'session.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_upload_session(session):
+    """Elmenti a feltöltési munkamenet adatait (atomikusan, hogy újraindítás után is olvasható legyen)"""
+    session_dir = get_upload_session_dir(session['id'])
+    tmp_path = os.path.join(session_dir, 'session.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(session, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(session_dir, 'session.json'))
+
+def get_session_data_path(upload_id):
+    """All chunks of a session are written in place into this one preallocated file"""
+    return os.path.join(get_upload_session_dir(upload_id), 'data.part')
+
+def get_session_journal_path(upload_id):
+    """Append-only list of completed chunk indexes"""
+    return os.path.join(get_upload_session_dir(upload_id), 'chunks.log')
+
+def get_expected_chunk_size(session, index):
+    """Every chunk is CHUNK_SIZE long except the last one"""
+    if index == session['total_chunks'] - 1:
+        return session['size'] - index * session['chunk_size']
+    return session['chunk_size']
+
+def get_received_chunks(session):
+    """Returns the sorted list of chunk indexes already stored in the staging area"""
+    try:
+        with open(get_session_journal_path(session['id']), 'r') as f:
+            return sorted({int(line) for line in f if line.strip()})
+    except (OSError, ValueError):
+        return []
+
+def mark_chunk_received(upload_id, index):
+    # Az O_APPEND írás egy sorra atomikus, így párhuzamos kérések sem keverednek
+    with open(get_session_journal_path(upload_id), 'a') as f:
+        f.write(f'{index}\n')
+        f.flush()
+        sync_fd(f.fileno())
+
+def write_at(fd, data, offset):
+    """Positional write of the whole buffer; does not move any shared file offset"""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, 'pwrite'):
+            written = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+def get_last_activity(path):
+    """Latest mtime of a session directory and the files inside it"""
+    latest = os.path.getmtime(path)
+    for entry in os.scandir(path):
+        latest = max(latest, entry.stat().st_mtime)
+    return latest
+
+def cleanup_stale_upload_sessions():
+    """Törli azokat a félbehagyott feltöltéseket, amelyek UPLOAD_SESSION_TTL óta nem frissültek"""
+    if not os.path.isdir(STAGING_FOLDER):
+        return 0
+    removed = 0
+    now = time.time()
+    for name in os.listdir(STAGING_FOLDER):
+        path = os.path.join(STAGING_FOLDER, name)
+        if os.path.isdir(path):
+            updated_at = get_last_activity(path)
+        elif name.endswith('.tmp'):
+            # Megszakadt streaming feltöltésből visszamaradt ideiglenes fájl
+            updated_at = os.path.getmtime(path)
+        else:
+            continue
+        if now - updated_at > UPLOAD_SESSION_TTL:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+            removed += 1
+    return removed
+
+def count_client_upload_sessions(client):
+    """Number of unfinished chunked uploads started from the given address"""
+    if not os.path.isdir(STAGING_FOLDER):
+        return 0
+    return sum(1 for name in os.listdir(STAGING_FOLDER)
+               if (load_upload_session(name) or {}).get('client') == client)
+
+def upload_cleanup_worker():
+    """Háttérfeladat: időnként kitakarítja a lejárt feltöltési munkameneteket"""
+    while True:
+        try:
+            removed = cleanup_stale_upload_sessions()
+            if removed:
+                print(f'{removed} lejárt feltöltési munkamenet törölve')
+        except Exception as e:
+            print(f'Hiba a feltöltési munkamenetek takarításakor: {e}')
+        socketio.sleep(UPLOAD_CLEANUP_INTERVAL)
+
+
+# --- Tartósság (fsync, előfoglalás) ---
+
+def preallocate_fd(fd, size):
+    """Reserves size bytes up front so large files get contiguous extents"""
+    if size > 0 and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass  # Pl. fallocate-et nem támogató fájlrendszer
+    os.ftruncate(fd, size)
+
+def sync_fd(fd):
+    """Flushes file data to disk unless UPLOAD_DURABILITY is 'none'"""
+    if UPLOAD_DURABILITY != 'none':
+        os.fsync(fd)
+
+def sync_dir(path):
+    """Makes renames and links in path durable ('fsync_dir' profile only)"""
+    if UPLOAD_DURABILITY != 'fsync_dir' or not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# --- Streaming feltöltés (Werkzeug temp-fájl nélkül) ---
+
+class StagingFile:
+    """Temporary file in STAGING_FOLDER that is renamed into place once the upload is complete.
+
+    The staging folder lives inside UPLOAD_FOLDER, so the final os.replace is an
+    atomic rename on the same filesystem instead of a second copy of the data.
+    """
+
+    def __init__(self, prefix='upload-'):
+        os.makedirs(STAGING_FOLDER, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix='.tmp', dir=STAGING_FOLDER)
+        self.file = os.fdopen(fd, 'w+b', buffering=UPLOAD_WRITE_BUFFER)
+        self.size = 0
+        self.allocated = 0
+        self.committed = False
+        self.hasher = hashlib.sha256()
+
+    def write(self, data):
+        self.file.write(data)
+        self.hasher.update(data)
+        self.size += len(data)
+        return len(data)
+
+    @property
+    def sha256(self):
+        return self.hasher.hexdigest()
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def seek(self, offset, whence=0):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def flush(self):
+        self.file.flush()
+
+    def preallocate(self, size):
+        """Reserves size bytes up front when the final size is known"""
+        preallocate_fd(self.file.fileno(), size)
+        self.allocated = size
+
+    def finish(self):
+        """Syncs and closes the file; the caller takes ownership of self.path"""
+        self.file.flush()
+        if self.allocated > self.size:
+            self.file.truncate(self.size)  # A vártnál rövidebb törzs: a lefoglalt végét levágjuk
+        sync_fd(self.file.fileno())
+        self.file.close()
+        self.committed = True
+        return self.path
+
+    def close(self):
+        # A be nem fejezett (commit nélküli) feltöltés ideiglenes fájlját töröljük
+        if not self.file.closed:
+            self.file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+class StreamingUploadRequest(Request):
+    """Request whose multipart file parts are written straight into the staging folder."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        staging = StagingFile()
+        if content_length:
+            staging.preallocate(content_length)
+        return staging
+
+app.request_class = StreamingUploadRequest
+
+# --- Tartalom-alapú (deduplikáló) tárolás ---
+
+blob_index = None  # {'names': {név: hash}, 'blobs': {hash: {'size', 'refs'}}}
+blob_index_lock = threading.Lock()
+
+def get_blob_index():
+    """Lazily loads the name -> blob index from BLOB_INDEX_FILE"""
+    global blob_index
+    if blob_index is None:
+        try:
+            with open(BLOB_INDEX_FILE, 'r', encoding='utf-8') as f:
+                blob_index = json.load(f)
+        except (OSError, ValueError):
+            blob_index = {'names': {}, 'blobs': {}}
+    return blob_index
+
+def save_blob_index():
+    """Elmenti a blob indexet (atomikusan)"""
+    os.makedirs(DATA_FOLDER, exist_ok=True)
+    tmp_path = BLOB_INDEX_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(blob_index, f)
+    os.replace(tmp_path, BLOB_INDEX_FILE)
+
+def get_blob_path(digest):
+    return os.path.join(BLOBS_FOLDER, digest[:2], digest)
+
+def release_blob_name(filename):
+    """Drops a name's reference; the blob is deleted when its last name is gone.
+
+    Must be called with blob_index_lock held.
+    """
+    index = get_blob_index()
+    digest = index['names'].pop(filename, None)
+    if digest is None:
+        return False
+    blob = index['blobs'].get(digest)
+    if blob:
+        blob['refs'] -= 1
+        if blob['refs'] <= 0:
+            del index['blobs'][digest]
+            try:
+                os.remove(get_blob_path(digest))
+            except FileNotFoundError:
+                pass
+    return True
+
+def link_blob(digest, filename):
+    """Makes filename point at an existing blob (hard link, copy as fallback).
+
+    Must be called with blob_index_lock held.
+    """
+    dest_path = os.path.join(UPLOAD_FOLDER, filename)
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    try:
+        os.link(get_blob_path(digest), dest_path)
+    except OSError:
+        # Hard linket nem támogató fájlrendszer: külön másolat
+        shutil.copyfile(get_blob_path(digest), dest_path)
+    index = get_blob_index()
+    index['names'][filename] = digest
+    index['blobs'][digest]['refs'] += 1
+
+def hash_file(path):
+    """SHA-256 of a file that was not hashed while it was being written"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def store_file(src_path, filename, digest=None, hash_later=False):
+    """Moves a finished temp file from the staging area to its user-visible name.
+
+    With hash_later an unhashed file is stored as a plain file right away; the
+    background hash job moves it into the blob store (see adopt_into_blob_store).
+    """
+    dest_path = os.path.join(UPLOAD_FOLDER, filename)
+    with blob_index_lock:
+        changed = release_blob_name(filename)
+        if DEDUP_STORAGE and (digest or not hash_later):
+            digest = digest or hash_file(src_path)
+            index = get_blob_index()
+            if digest in index['blobs'] and os.path.exists(get_blob_path(digest)):
+                os.remove(src_path)  # A tartalom már megvan, az új példányt eldobjuk
+            else:
+                os.makedirs(os.path.dirname(get_blob_path(digest)), exist_ok=True)
+                size = os.path.getsize(src_path)
+                os.replace(src_path, get_blob_path(digest))
+                sync_dir(os.path.dirname(get_blob_path(digest)))
+                index['blobs'][digest] = {'size': size, 'refs': 0}
+            link_blob(digest, filename)
+            changed = True
+        else:
+            os.replace(src_path, dest_path)
+        sync_dir(UPLOAD_FOLDER)
+        if changed:
+            save_blob_index()
+    on_file_stored(filename, digest)
+    return dest_path
+
+def adopt_into_blob_store(filename, digest, size, mtime):
+    """Dedups a file stored with hash_later once the hash job is done; skipped if it changed since"""
+    path = os.path.join(UPLOAD_FOLDER, filename)
+    with blob_index_lock:
+        index = get_blob_index()
+        if filename in index['names']:
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        if stat.st_size != size or stat.st_mtime != mtime:
+            return  # Hash-elés óta felülírták, a tartalom már nem ehhez a hash-hez tartozik
+        blob_path = get_blob_path(digest)
+        if digest in index['blobs'] and os.path.exists(blob_path):
+            link_blob(digest, filename)  # Már tárolt tartalom: a másolat helyére link kerül
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            try:
+                os.link(path, blob_path)  # Ugyanaz az inode, másolás nélkül
+            except OSError:
+                shutil.copyfile(path, blob_path)
+            sync_dir(os.path.dirname(blob_path))
+            index['blobs'][digest] = {'size': stat.st_size, 'refs': 1}
+            index['names'][filename] = digest
+        save_blob_index()
+    file_index.refresh(filename)
+
+def store_upload(staging, filename):
+    """Stores a StagingFile whose content hash was computed while it streamed in"""
+    return store_file(staging.finish(), filename, staging.sha256)
+
+def remove_upload(filename):
+    """Deletes a user-visible file and releases its blob reference"""
+    os.remove(os.path.join(UPLOAD_FOLDER, filename))
+    file_index.remove(filename)
+    with blob_index_lock:
+        if release_blob_name(filename):
+            save_blob_index()
+    forget_file_hash(filename)
+
+# --- Hash index (feltöltés előtti tartalom-ellenőrzéshez) ---
+
+hash_index = None  # {név: {'sha256', 'size', 'mtime'}}
+hash_index_by_content = {}  # (méret, sha256) -> {nevek}
+hash_index_dirty = False
+hash_index_lock = threading.Lock()
+
+def get_hash_index():
+    """Lazily loads the persistent name -> content hash index"""
+    global hash_index
+    if hash_index is None:
+        try:
+            with open(HASH_INDEX_FILE, 'r', encoding='utf-8') as f:
+                hash_index = json.load(f)
+        except (OSError, ValueError):
+            hash_index = {}
+        for name, entry in hash_index.items():
+            hash_index_by_content.setdefault((entry['size'], entry['sha256']), set()).add(name)
+    return hash_index
+
+def _forget_hash(filename):
+    entry = get_hash_index().pop(filename, None)
+    if entry:
+        names = hash_index_by_content.get((entry['size'], entry['sha256']))
+        if names:
+            names.discard(filename)
+            if not names:
+                del hash_index_by_content[(entry['size'], entry['sha256'])]
+
+def record_file_hash(filename, digest):
+    """Records the content hash of a file that was just written to UPLOAD_FOLDER"""
+    global hash_index_dirty
+    try:
+        stat = os.stat(os.path.join(UPLOAD_FOLDER, filename))
+    except OSError:
+        return
+    with hash_index_lock:
+        _forget_hash(filename)
+        get_hash_index()[filename] = {'sha256': digest, 'size': stat.st_size, 'mtime': stat.st_mtime}
+        hash_index_by_content.setdefault((stat.st_size, digest), set()).add(filename)
+        hash_index_dirty = True
+
+def forget_file_hash(filename):
+    global hash_index_dirty
+    with hash_index_lock:
+        if filename in get_hash_index():
+            _forget_hash(filename)
+            hash_index_dirty = True
+
+def find_file_by_hash(size, digest):
+    """Returns the name of a stored file with the given content, or None.
+
+    Entries are validated against the file's current size and mtime, so files
+    changed or removed behind our back are never reported as matches.
+    """
+    global hash_index_dirty
+    with hash_index_lock:
+        index = get_hash_index()
+        for name in list(hash_index_by_content.get((size, digest), ())):
+            entry = index[name]
+            try:
+                stat = os.stat(os.path.join(UPLOAD_FOLDER, name))
+                if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+                    return name
+            except OSError:
+                pass
+            _forget_hash(name)
+            hash_index_dirty = True
+    return None
+
+def get_file_hash(filename, stat):
+    """Returns the recorded content hash if it still matches the file's size and mtime"""
+    with hash_index_lock:
+        entry = get_hash_index().get(filename)
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        return entry['sha256']
+    return None
+
+def flush_hash_index():
+    """Writes the hash index to disk if it changed since the last flush"""
+    global hash_index_dirty
+    with hash_index_lock:
+        if not hash_index_dirty:
+            return
+        snapshot = json.dumps(get_hash_index())
+        hash_index_dirty = False
+    os.makedirs(DATA_FOLDER, exist_ok=True)
+    tmp_path = HASH_INDEX_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(snapshot)
+    os.replace(tmp_path, HASH_INDEX_FILE)
+
+def hash_index_flush_worker():
+    """Háttérfeladat: a hash index változásait kötegelve írja lemezre"""
+    while True:
+        try:
+            flush_hash_index()
+        except Exception as e:
+            print(f'Hiba a hash index mentésekor: {e}')
+        socketio.sleep(HASH_INDEX_FLUSH_INTERVAL)
+
+def link_existing_content(size, digest, filename):
+    """Creates filename from content that is already stored, without uploading it again.
+
+    Returns False if no stored file has this content.
+    """
+    dest_path = os.path.join(UPLOAD_FOLDER, filename)
+    with blob_index_lock:
+        index = get_blob_index()
+        if DEDUP_STORAGE and digest in index['blobs'] and os.path.exists(get_blob_path(digest)):
+            release_blob_name(filename)
+            link_blob(digest, filename)
+            sync_dir(UPLOAD_FOLDER)
+            save_blob_index()
+            on_file_stored(filename, digest)
+            return True
+
+    source = find_file_by_hash(size, digest)
+    if source is None:
+        return False
+    if source == filename:
+        return True
+    with blob_index_lock:
+        if release_blob_name(filename):
+            save_blob_index()
+        # Ideiglenes néven linkelünk, majd atomikusan a helyére tesszük
+        os.makedirs(STAGING_FOLDER, exist_ok=True)
+        tmp_path = os.path.join(STAGING_FOLDER, f'link-{uuid.uuid4().hex}.tmp')
+        try:
+            os.link(os.path.join(UPLOAD_FOLDER, source), tmp_path)
+        except OSError:
+            shutil.copyfile(os.path.join(UPLOAD_FOLDER, source), tmp_path)
+        os.replace(tmp_path, dest_path)
+        sync_dir(UPLOAD_FOLDER)
+    on_file_stored(filename, digest)
+    return True
+
+# --- Feltöltés utáni háttérfeldolgozás ---
+
+# Típus -> {'func': a feldolgozó folyamatban futó függvény, 'on_complete': a szerveren
+# futó utófeldolgozás, 'limit': egyszerre futó példányok, 'match': kell-e futtatni az adott fájlra}
+job_types = {}
+jobs = {}  # azonosító -> feladat (várakozó és futó)
+job_history = []  # legutóbb befejezett feladatok
+job_futures = {}  # azonosító -> Future
+jobs_lock = threading.Lock()
+jobs_dirty = False
+job_pool = None
+
+def register_job_type(job_type, func, on_complete=None, limit=1, match=None):
+    """Registers a post-upload job type; func must be a top-level (picklable) function"""
+    job_types[job_type] = {'func': func, 'on_complete': on_complete, 'limit': limit, 'match': match}
+
+def load_jobs():
+    """Visszatölti a félbemaradt feladatokat; a futás közben megszakadtak újra sorba kerülnek"""
+    global jobs_dirty
+    try:
+        with open(JOBS_FILE, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return
+    with jobs_lock:
+        for job in saved:
+            job['status'] = 'queued'
+            jobs[job['id']] = job
+        jobs_dirty = True
+
+def save_jobs():
+    global jobs_dirty
+    with jobs_lock:
+        if not jobs_dirty:
+            return
+        snapshot = json.dumps(list(jobs.values()), ensure_ascii=False)
+        jobs_dirty = False
+    os.makedirs(DATA_FOLDER, exist_ok=True)
+    tmp_path = JOBS_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(snapshot)
+    os.replace(tmp_path, JOBS_FILE)
+
+def enqueue_job(job_type, filename):
+    """Sorba állít egy feladatot az adott fájlra"""
+    global jobs_dirty
+    try:
+        stat = os.stat(os.path.join(UPLOAD_FOLDER, filename))
+    except OSError:
+        return None
+    with jobs_lock:
+        for job in jobs.values():
+            if (job['type'] == job_type and job['filename'] == filename
+                    and job['size'] == stat.st_size and job['mtime'] == stat.st_mtime):
+                return job  # Ugyanerre a fájlállapotra már van feladat
+    job = {
+        'id': uuid.uuid4().hex,
+        'type': job_type,
+        'filename': filename,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'status': 'queued',
+        'created_at': time.time()
+    }
+    with jobs_lock:
+        jobs[job['id']] = job
+        jobs_dirty = True
+    return job
+
+def on_file_stored(filename, digest=None):
+    """Called after a file is written to UPLOAD_FOLDER by any upload path"""
+    file_index.refresh(filename)
+    if digest:
+        record_file_hash(filename, digest)
+    for job_type, spec in job_types.items():
+        if spec['match'] is None or spec['match'](filename, digest):
+            enqueue_job(job_type, filename)
+
+def is_job_file_current(job):
+    """True if the file still has the size and mtime it had when the job was queued"""
+    try:
+        stat = os.stat(os.path.join(UPLOAD_FOLDER, job['filename']))
+    except OSError:
+        return False
+    return stat.st_size == job['size'] and stat.st_mtime == job['mtime']
+
+def dispatch_jobs():
+    """Starts queued jobs while respecting the per-type concurrency limits"""
+    global job_pool, jobs_dirty
+    with jobs_lock:
+        running = {}
+        for job in jobs.values():
+            if job['status'] == 'running':
+                running[job['type']] = running.get(job['type'], 0) + 1
+        for job in sorted(jobs.values(), key=lambda j: j['created_at']):
+            spec = job_types.get(job['type'])
+            if job['status'] != 'queued' or not spec or running.get(job['type'], 0) >= spec['limit']:
+                continue
+            if job_pool is None:
+                # forkserver: a munkafolyamatok nem öröklik a szerver socketjeit és fájlleíróit
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None)
+                job_pool = concurrent.futures.ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=context)
+            path = os.path.abspath(os.path.join(UPLOAD_FOLDER, job['filename']))
+            job_futures[job['id']] = job_pool.submit(spec['func'], path)
+            job['status'] = 'running'
+            running[job['type']] = running.get(job['type'], 0) + 1
+            jobs_dirty = True
+
+def collect_finished_jobs():
+    """Feldolgozza a befejezett feladatok eredményét és értesíti a klienseket"""
+    global jobs_dirty
+    for job_id, future in list(job_futures.items()):
+        if not future.done():
+            continue
+        del job_futures[job_id]
+        with jobs_lock:
+            job = jobs.pop(job_id)
+            jobs_dirty = True
+        try:
+            result = future.result()
+            spec = job_types[job['type']]
+            if spec['on_complete'] and is_job_file_current(job):
+                spec['on_complete'](job, result)
+            job['status'] = 'done'
+            socketio.emit('artifact_ready', {'type': job['type'], 'filename': job['filename'], 'result': result})
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            print(f"Hiba a(z) {job['type']} feladat futtatásakor ({job['filename']}): {e}")
+        job['finished_at'] = time.time()
+        job_history.append(job)
+        del job_history[:-JOB_HISTORY_SIZE]
+
+def job_dispatcher_worker():
+    """Háttérfeladat: elindítja a várakozó feladatokat és begyűjti az eredményeket"""
+    load_jobs()
+    while True:
+        try:
+            collect_finished_jobs()
+            dispatch_jobs()
+            save_jobs()
+        except Exception as e:
+            print(f'Hiba a háttérfeladatok ütemezésekor: {e}')
+        socketio.sleep(0.5)
+
+# --- Háttérfeladat típusok ---
+
+def job_hash_file(path):
+    """Worker process: content hash of a file that was not hashed while uploading"""
+    return {'sha256': hash_file(path)}
+
+def on_hash_complete(job, result):
+    if DEDUP_STORAGE:
+        adopt_into_blob_store(job['filename'], result['sha256'], job['size'], job['mtime'])
+    record_file_hash(job['filename'], result['sha256'])
+
+register_job_type('hash', job_hash_file, on_complete=on_hash_complete, limit=2,
+                  match=lambda filename, digest: digest is None)
+
+# --- Bélyegképek ---
+
+THUMB_MIMETYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+thumb_cache = OrderedDict()  # gyorsítótár-fájl útvonala -> méret, a legrégebben használt elöl
+thumb_cache_bytes = 0
+thumb_cache_loaded = False
+thumb_cache_lock = threading.Lock()
+
+def is_thumbnailable(filename):
+    """Raster images only; SVGs are small and scale on their own"""
+    return get_file_info(filename)[0] == 'image' and not filename.lower().endswith('.svg')
+
+def get_thumb_formats():
+    return ['webp', 'jpeg'] if features.check('webp') else ['jpeg']
+
+def get_thumb_bucket(width):
+    buckets = sorted(set(THUMB_WIDTHS + PREVIEW_WIDTHS))
+    for bucket in buckets:
+        if width <= bucket:
+            return bucket
+    return buckets[-1]
+
+def is_original_better(path, width):
+    """True when a derivative would not save anything: the image already fits the bucket and is
+    JPEG/WebP (re-encoding only loses quality), or it is animated (a derivative keeps one frame)"""
+    with Image.open(path) as image:
+        if getattr(image, 'is_animated', False):
+            return True
+        return image.format in ('JPEG', 'WEBP') and max(image.size) <= width
+
+def get_cache_key(filename, stat):
+    """Derived-artifact cache key; it covers name, mtime and size, so a changed file never hits a stale entry"""
+    return hashlib.sha1(f'{filename}\0{stat.st_mtime_ns}\0{stat.st_size}'.encode()).hexdigest()
+
+def get_thumb_path(filename, stat, width, fmt):
+    return os.path.join(THUMB_CACHE_FOLDER, f'{get_cache_key(filename, stat)}-{width}.{fmt}')
+
+def render_thumbnail(source_path, dest_path, width, fmt):
+    """Decodes, orients (EXIF) and downsizes an image to fit width x width; returns the bytes written"""
+    with Image.open(source_path) as image:
+        image.draft('RGB', (width, width))  # JPEG: a dekódolás eleve kicsinyítve történik
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, width), Image.Resampling.LANCZOS)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        if fmt == 'jpeg' and has_alpha:
+            # A JPEG-ben nincs átlátszóság: fehér háttérre kerül
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image.convert('RGBA'), mask=image.convert('RGBA'))
+            image = background
+        elif image.mode not in ('RGB', 'L', 'RGBA'):
+            image = image.convert('RGBA' if has_alpha and fmt == 'webp' else 'RGB')
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        temp_path = f'{dest_path}.{uuid.uuid4().hex}.tmp'
+        try:
+            if fmt == 'webp':
+                image.save(temp_path, 'WEBP', quality=THUMB_QUALITY, method=4)
+            else:
+                image.save(temp_path, 'JPEG', quality=THUMB_QUALITY, optimize=True, progressive=True)
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return os.path.getsize(dest_path)
+
+def load_thumb_cache():
+    """Rebuilds the LRU order from the cache folder; file mtimes record the last use"""
+    global thumb_cache_bytes, thumb_cache_loaded
+    found = []
+    try:
+        with os.scandir(THUMB_CACHE_FOLDER) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.path, stat.st_size))
+    except FileNotFoundError:
+        pass
+    for _, path, size in sorted(found):
+        thumb_cache[path] = size
+        thumb_cache_bytes += size
+    thumb_cache_loaded = True
+
+def record_thumb(path, size):
+    """Marks a cached thumbnail as just used and evicts the least recently used ones over budget"""
+    global thumb_cache_bytes
+    evicted = []
+    with thumb_cache_lock:
+        if not thumb_cache_loaded:
+            load_thumb_cache()
+        old = thumb_cache.pop(path, None)
+        if old is not None:
+            thumb_cache_bytes -= old
+        thumb_cache[path] = size
+        thumb_cache_bytes += size
+        while thumb_cache_bytes > THUMB_CACHE_MAX_BYTES and len(thumb_cache) > 1:
+            evicted_path, evicted_size = thumb_cache.popitem(last=False)
+            thumb_cache_bytes -= evicted_size
+            evicted.append(evicted_path)
+    try:
+        os.utime(path)  # Az LRU sorrend így újraindítás után is megmarad
+    except OSError:
+        pass
+    for evicted_path in evicted:
+        try:
+            os.remove(evicted_path)
+        except OSError:
+            pass
+
+def get_thumbnail(filename, stat, width, fmt):
+    """Path of the cached thumbnail, rendering it on a miss"""
+    path = get_thumb_path(filename, stat, width, fmt)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = render_thumbnail(os.path.join(UPLOAD_FOLDER, filename), path, width, fmt)
+    record_thumb(path, size)
+    return path
+
+def job_thumbnail(path):
+    """Worker process: renders the grid-size thumbnail in every output format ahead of the first view"""
+    stat = os.stat(path)
+    made = []
+    for fmt in get_thumb_formats():
+        dest = get_thumb_path(os.path.basename(path), stat, THUMB_PREGENERATE_WIDTH, fmt)
+        if not os.path.exists(dest):
+            made.append([os.path.basename(dest), render_thumbnail(path, dest, THUMB_PREGENERATE_WIDTH, fmt)])
+    return {'thumbnails': made}
+
+def on_thumbnail_complete(job, result):
+    for name, size in result['thumbnails']:
+        record_thumb(os.path.join(THUMB_CACHE_FOLDER, name), size)
+
+register_job_type('thumb', job_thumbnail, on_complete=on_thumbnail_complete, limit=1,
+                  match=lambda filename, digest: is_thumbnailable(filename))
+
+# --- Hullámforma (hangfájlok csúcsértékei) ---
+
+# Csak a minták felső bájtját nézzük: a 8 bites amplitúdó bőven elég a hullámformához, és így a
+# feldolgozás bájtszeletelés + translate, ami tiszta Pythonban is gyors
+PEAK_MAGNITUDE = bytes(b if b < 128 else min(127, 256 - b) for b in range(256))
+PCM_SIGN_FLIP = bytes((b + 128) % 256 for b in range(256))  # 8 bites WAV: előjel nélküli -> előjeles
+
+peak_decoders = []  # (név, felismerő, dekóder), regisztrálási sorrendben próbáljuk
+
+def register_peak_decoder(name, decoder, accepts):
+    """Adds an audio decoder for waveform peaks.
+
+    decoder(path) returns (sample_rate, channels, sample_width, chunks), where chunks yields
+    little-endian signed PCM bytes; accepts(path) tells whether the decoder should be tried.
+    """
+    peak_decoders.append((name, accepts, decoder))
+
+def decode_wav(path):
+    wav = wave.open(path, 'rb')  # Nem PCM WAV-nál (pl. float) wave.Error, ilyenkor a következő dekóder jön
+    rate, channels, width = wav.getframerate(), wav.getnchannels(), wav.getsampwidth()
+    def chunks():
+        with wav:
+            while True:
+                data = wav.readframes(rate)
+                if not data:
+                    break
+                yield data.translate(PCM_SIGN_FLIP) if width == 1 else data
+    return rate, channels, width, chunks()
+
+def decode_ffmpeg(path):
+    process = subprocess.Popen(
+        [FFMPEG_PATH, '-v', 'error', '-nostdin', '-i', path, '-vn', '-ac', '1',
+         '-ar', str(PEAKS_DECODE_RATE), '-f', 's16le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    def chunks():
+        try:
+            while True:
+                data = process.stdout.read(1024 * 1024)
+                if not data:
+                    break
+                yield data
+            if process.wait() != 0:
+                raise ValueError(f'ffmpeg: {process.stderr.read().decode(errors="replace").strip()}')
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+    return PEAKS_DECODE_RATE, 1, 2, chunks()
+
+register_peak_decoder('wave', decode_wav, lambda path: path.lower().endswith('.wav'))
+register_peak_decoder('ffmpeg', decode_ffmpeg, lambda path: FFMPEG_PATH is not None)
+
+def has_peak_decoder(filename):
+    return get_file_info(filename)[0] == 'audio' and any(accepts(filename) for _, accepts, _ in peak_decoders)
+
+def peaks_from_pcm(rate, channels, width, chunks):
+    """Returns (duration, peaks) with PEAKS_POINTS values in 0..1 from a PCM stream"""
+    frame_size = channels * width
+    block = max(1, rate // PEAKS_BLOCKS_PER_SECOND) * channels  # Felső bájtok száma egy blokkban
+    fine = bytearray()
+    carry, leftover, frames = b'', b'', 0
+    for chunk in chunks:
+        data = leftover + chunk
+        usable = len(data) - len(data) % frame_size
+        leftover = data[usable:]
+        frames += usable // frame_size
+        high = carry + data[width - 1:usable:width].translate(PEAK_MAGNITUDE)
+        full = len(high) - len(high) % block
+        fine.extend(max(high[i:i + block]) for i in range(0, full, block))
+        carry = high[full:]
+    if carry:
+        fine.append(max(carry))
+    points = min(PEAKS_POINTS, len(fine))
+    step = len(fine) / points if points else 0
+    peaks = [round(max(fine[int(i * step):int((i + 1) * step) or 1]) / 127, 3) for i in range(points)]
+    return frames / rate, peaks
+
+def compute_peaks(path):
+    """Tries the registered decoders in order; ValueError if none can read the file"""
+    errors = []
+    for name, accepts, decoder in peak_decoders:
+        if not accepts(path):
+            continue
+        try:
+            duration, peaks = peaks_from_pcm(*decoder(path))
+            return {'duration': duration, 'peaks': peaks, 'decoder': name}
+        except (wave.Error, EOFError, ValueError, OSError) as e:
+            errors.append(f'{name}: {e}')
+    raise ValueError('; '.join(errors) or 'No decoder available for this audio format')
+
+def get_peaks_path(filename, stat):
+    return os.path.join(PEAKS_CACHE_FOLDER, f'{get_cache_key(filename, stat)}.json')
+
+def write_peaks(path, dest_path):
+    result = compute_peaks(path)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    temp_path = f'{dest_path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, separators=(',', ':'))
+    os.replace(temp_path, dest_path)
+    return result
+
+def job_peaks(path):
+    """Worker process: waveform peaks for long recordings, cached for the preview"""
+    dest = get_peaks_path(os.path.basename(path), os.stat(path))
+    if os.path.exists(dest):
+        return {'cached': True}
+    result = write_peaks(path, dest)
+    return {'duration': result['duration'], 'points': len(result['peaks'])}  # A csúcsokat nem küldjük szét
+
+register_job_type('peaks', job_peaks, limit=1,
+                  match=lambda filename, digest: has_peak_decoder(filename))
+
+# --- Szöveges előnézet (sorindex) ---
+
+def count_newlines(mm, start, end, chunk_size=4 * 1024 * 1024):
+    count = 0
+    for pos in range(start, end, chunk_size):
+        count += mm[pos:min(end, pos + chunk_size)].count(b'\n')
+    return count
+
+class LineIndex:
+    """Sparse line-offset index of one text file.
+
+    Roughly every LINE_INDEX_STEP bytes the start offset and number of a line
+    is recorded, so any line is reached with one bisect and a short forward
+    scan. Building needs one pass over the file; when the same file only grew
+    (same inode, larger size) the pass continues where it stopped.
+    """
+
+    def __init__(self, key):
+        self.key = key  # (st_dev, st_ino)
+        self.lock = threading.Lock()
+        self.offsets = [0]  # sorkezdetek bájtpozíciói
+        self.lines = [0]  # az ott kezdődő sor (0-tól számolt) sorszáma
+        self.newlines = 0
+        self.scanned = 0
+        self.mtime_ns = None
+        self.last_byte = b''
+
+    def can_extend(self, stat):
+        return (stat.st_dev, stat.st_ino) == self.key and stat.st_size >= self.scanned
+
+    def extend(self, mm, size, mtime_ns):
+        pos = self.scanned
+        while pos < size:
+            target = self.offsets[-1] + LINE_INDEX_STEP
+            newline = mm.find(b'\n', max(pos, target - 1), size) if target < size else -1
+            if newline < 0:
+                self.newlines += count_newlines(mm, pos, size)
+                break
+            self.newlines += count_newlines(mm, pos, newline + 1)
+            pos = newline + 1
+            if pos < size:
+                self.offsets.append(pos)
+                self.lines.append(self.newlines)
+        self.scanned = size
+        self.mtime_ns = mtime_ns
+        self.last_byte = mm[size - 1:size] if size else b''
+
+    @property
+    def total_lines(self):
+        return self.newlines + (1 if self.last_byte not in (b'', b'\n') else 0)
+
+    def count_lines(self, mm, size):
+        """Number of lines in the first size bytes (size <= scanned)"""
+        i = bisect.bisect_right(self.offsets, size) - 1
+        newlines = self.lines[i] + count_newlines(mm, self.offsets[i], size)
+        return newlines + (1 if size and mm[size - 1:size] != b'\n' else 0)
+
+    def read(self, mm, size, first, count):
+        """Lines first..first+count-1 (0-based) of the first size bytes as (text, truncated) pairs"""
+        i = bisect.bisect_right(self.lines, first) - 1
+        pos, line = self.offsets[i], self.lines[i]
+        while line < first and pos < size:
+            newline = mm.find(b'\n', pos, size)
+            pos = size if newline < 0 else newline + 1
+            line += 1
+        result = []
+        while len(result) < count and pos < size:
+            newline = mm.find(b'\n', pos, size)
+            end = size if newline < 0 else newline
+            raw = mm[pos:min(end, pos + PREVIEW_LINE_MAX_BYTES)]
+            truncated = end - pos > PREVIEW_LINE_MAX_BYTES
+            if not truncated and raw.endswith(b'\r'):
+                raw = raw[:-1]
+            result.append((raw.decode('utf-8', errors='replace'), truncated))
+            pos = end + 1
+        return result
+
+line_indexes = OrderedDict()  # fájlnév -> LineIndex, LRU sorrendben
+line_indexes_lock = threading.Lock()
+
+def get_line_index(filename, mm, stat):
+    """Cached index of the file, extended or rebuilt if it changed since"""
+    with line_indexes_lock:
+        index = line_indexes.pop(filename, None)
+        if index is None or not index.can_extend(stat) or (
+                index.scanned == stat.st_size and index.mtime_ns != stat.st_mtime_ns):
+            index = LineIndex((stat.st_dev, stat.st_ino))  # Új, csonkolt vagy helyben átírt fájl
+        line_indexes[filename] = index
+        while len(line_indexes) > LINE_INDEX_CACHE_SIZE:
+            line_indexes.popitem(last=False)
+    with index.lock:
+        if stat.st_size > index.scanned:  # Egy párhuzamos kérés már tovább is juthatott
+            index.extend(mm, stat.st_size, stat.st_mtime_ns)
+    return index
+
+def read_text_window(path, filename, first, count, until=None):
+    """Reads a window of lines; first is 0-based. With until only the first until bytes count
+    as the file, so a live-tail client can line the window up with the bytes it was pushed."""
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        size = stat.st_size if until is None else min(until, stat.st_size)
+        if not size:
+            return {'lines': [], 'truncated': [], 'total_lines': 0, 'size': 0, 'ends_with_newline': True}
+        with mmap.mmap(f.fileno(), stat.st_size, access=mmap.ACCESS_READ) as mm:
+            index = get_line_index(filename, mm, stat)
+            with index.lock:
+                lines = index.read(mm, size, first, count)
+                total_lines = index.total_lines if size == index.scanned else index.count_lines(mm, size)
+            ends_with_newline = mm[size - 1:size] == b'\n'
+    return {
+        'lines': [text for text, _ in lines],
+        'truncated': [first + i + 1 for i, (_, truncated) in enumerate(lines) if truncated],
+        'total_lines': total_lines,
+        'size': size,
+        'ends_with_newline': ends_with_newline,
+    }
+
+# --- Élő követés (tail) ---
+
+def complete_utf8_length(data):
+    """Length of data without a trailing, still incomplete UTF-8 sequence"""
+    for back in range(1, min(3, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue  # Folytató bájt, a kezdőbájtot keressük
+        if byte >= 0xC0:
+            needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return len(data) - back if back < needed else len(data)
+        break
+    return len(data)
+
+class TailReader:
+    """Shared reader of one followed file.
+
+    However many clients follow the file, it is read once: appended bytes go to
+    the tail:<name> room as tail_data {offset, size, data}. Truncation and
+    rotation (a new file under the same name) produce tail_reset {size}, after
+    which the stream continues from size.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.path = os.path.join(UPLOAD_FOLDER, filename)
+        self.room = f'tail:{filename}'
+        self.subscribers = set()
+        self.file = None
+        self.key = None
+        self.offset = 0
+        self.dirty = False
+        self.open()
+
+    def open(self, offset=None):
+        self.close()
+        self.file = open(self.path, 'rb')
+        stat = os.fstat(self.file.fileno())
+        self.key = (stat.st_dev, stat.st_ino)
+        self.offset = stat.st_size if offset is None else offset
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def read_new(self, size):
+        if size - self.offset > TAIL_MAX_BACKLOG:
+            self.offset = size
+            return [('tail_reset', {'size': size, 'reason': 'skipped'})]
+        self.file.seek(self.offset)
+        data = self.file.read(size - self.offset)
+        data = data[:complete_utf8_length(data)]  # A félbe vágott karakter a következő körben megy ki
+        if not data:
+            return []
+        start, self.offset = self.offset, self.offset + len(data)
+        return [('tail_data', {'offset': start, 'size': self.offset, 'data': data.decode('utf-8', errors='replace')})]
+
+    def poll(self):
+        """Reads what changed since the last call; returns the events to send"""
+        self.dirty = False
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []  # Forgatás közben a név egy pillanatig hiányozhat
+        events = []
+        if (stat.st_dev, stat.st_ino) != self.key or stat.st_size < self.offset:
+            if (stat.st_dev, stat.st_ino) != self.key:
+                # Forgatás: a régi fájl utolsó sorai még a régi leíróból jönnek
+                events += self.read_new(os.fstat(self.file.fileno()).st_size)
+                reason = 'rotated'
+            else:
+                reason = 'truncated'
+            self.open(0)
+            if stat.st_size > TAIL_MAX_BACKLOG:
+                self.offset = stat.st_size
+            events.append(('tail_reset', {'size': self.offset, 'reason': reason}))
+        if stat.st_size > self.offset:
+            events += self.read_new(stat.st_size)
+        return events
+
+tail_readers = {}  # fájlnév -> TailReader
+tail_lock = threading.Lock()
+
+def subscribe_tail(filename, sid):
+    """Adds a follower; returns the offset its stream starts from"""
+    with tail_lock:
+        reader = tail_readers.get(filename)
+        if reader is None:
+            reader = tail_readers[filename] = TailReader(filename)
+        reader.subscribers.add(sid)
+        return reader.offset
+
+def unsubscribe_tail(sid, filename=None):
+    """Removes a follower (from every file if filename is None); the last one closes the reader"""
+    with tail_lock:
+        for name, reader in list(tail_readers.items()):
+            if filename not in (None, name):
+                continue
+            reader.subscribers.discard(sid)
+            if not reader.subscribers:
+                reader.close()
+                del tail_readers[name]
+
+def wake_tail_readers(names=None):
+    """Marks followed files as changed (names=None: all of them); called from the inotify watcher"""
+    with tail_lock:
+        for name, reader in tail_readers.items():
+            if names is None or name in names:
+                reader.dirty = True
+
+def tail_worker():
+    """Háttérfeladat: a követett fájlok új bájtjait küldi ki; fájlonként egy olvasó, akárhány követő"""
+    last_poll = 0
+    while True:
+        socketio.sleep(TAIL_WAKE_INTERVAL)
+        full = time.time() - last_poll >= TAIL_POLL_INTERVAL
+        if full:
+            last_poll = time.time()
+        outgoing = []
+        with tail_lock:
+            for reader in tail_readers.values():
+                if not (full or reader.dirty):
+                    continue
+                try:
+                    outgoing += [(event, dict(payload, filename=reader.filename), reader.room)
+                                 for event, payload in reader.poll()]
+                except OSError as e:
+                    print(f'Hiba a(z) {reader.filename} követésekor: {e}')
+        for event, payload, room in outgoing:
+            socketio.emit(event, payload, room=room)
+
+# --- Letöltés: validátorok és tartománykérések ---
+
+def is_hidden_path(filename):
+    """True for names inside the internal areas (.staging, .blobs) or any other dot path; these are never served"""
+    return any(part.startswith('.') for part in re.split(r'[\\/]', filename))
+
+def get_file_etag(filename, stat):
+    """Returns (etag, is_strong) for a stored file.
+
+    The strong ETag is the content hash from the hash index. Small files without
+    a recorded hash are hashed on the spot; larger ones get a hash job and a weak,
+    stat-based ETag until the job finishes.
+    """
+    if '/' not in filename:
+        digest = get_file_hash(filename, stat)
+        if digest is None and stat.st_size <= ETAG_SYNC_HASH_MAX:
+            digest = run_blocking(hash_file, os.path.join(UPLOAD_FOLDER, filename))
+            record_file_hash(filename, digest)
+        if digest:
+            return digest, True
+        enqueue_job('hash', filename)
+    return f'{stat.st_size:x}-{stat.st_mtime_ns:x}', False
+
+def if_range_matches(etag, is_strong, last_modified):
+    """RFC 7233 If-Range: ranges are only served if the client's copy is current"""
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return is_strong and if_range.etag == etag
+    if if_range.date is not None:
+        return if_range.date == last_modified
+    return True
+
+BYTE_RANGE_RE = re.compile(r'^(\d*)-(\d*)$')
+
+def parse_byte_ranges(header):
+    """Raw (start, stop) pairs of a Range header; suffix ranges get a negative start.
+
+    Unlike werkzeug's parser this accepts overlapping and unordered ranges,
+    which resolve_byte_ranges then coalesces.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    ranges = []
+    for spec in header[len('bytes='):].split(','):
+        match = BYTE_RANGE_RE.match(spec.strip())
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if not first:
+            ranges.append((-int(last), None))
+        elif last and int(last) < int(first):
+            return None
+        else:
+            ranges.append((int(first), int(last) + 1 if last else None))
+    return ranges
+
+def resolve_byte_ranges(ranges, size):
+    """Absolute, sorted and coalesced (start, stop) pairs of the satisfiable ranges"""
+    resolved = []
+    for start, stop in ranges:
+        if start < 0:
+            start, stop = max(0, size + start), size
+        stop = size if stop is None else min(stop, size)
+        if start < stop:
+            resolved.append((start, stop))
+    resolved.sort()
+    merged = []
+    for start, stop in resolved:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+def send_byte_ranges(path, ranges, size, mimetype):
+    """206 response for resolved ranges; several ranges become multipart/byteranges"""
+    def read_range(f, start, stop):
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            block = f.read(min(256 * 1024, remaining))
+            if not block:
+                return
+            remaining -= len(block)
+            yield block
+
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        if request.environ.get('wsgi.file_wrapper') is SendfileWrapper:
+            # A szerver Content-Length bájtot küld az aktuális pozíciótól os.sendfile-lal
+            f = open(path, 'rb')
+            f.seek(start)
+            body = SendfileWrapper(f, 256 * 1024, length=stop - start)
+        else:
+            def generate_single():
+                with open(path, 'rb') as f:
+                    yield from read_range(f, start, stop)
+            body = generate_single()
+
+        response = Response(body, status=206, mimetype=mimetype, direct_passthrough=True)
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        response.content_length = stop - start
+        return response
+
+    boundary = uuid.uuid4().hex
+    headers = [
+        f'\r\n--{boundary}\r\nContent-Type: {mimetype}\r\nContent-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n'.encode('ascii')
+        for start, stop in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode('ascii')
+
+    def generate():
+        with open(path, 'rb') as f:
+            for header, (start, stop) in zip(headers, ranges):
+                yield header
+                yield from read_range(f, start, stop)
+        yield closing
+
+    response = Response(generate(), status=206, mimetype=f'multipart/byteranges; boundary={boundary}')
+    response.content_length = sum(map(len, headers)) + sum(stop - start for start, stop in ranges) + len(closing)
+    return response
+
+# --- Tömörítés (Content-Encoding) ---
+
+class BrotliCompressor:
+    """brotli.Compressor with the compress()/flush() interface of zlib"""
+
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=5)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+def get_supported_encodings():
+    """Encodings in server preference order; optional ones only if their module is installed"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+def negotiate_encoding():
+    """Best Content-Encoding for the current request, or None for identity"""
+    return request.accept_encodings.best_match(get_supported_encodings())
+
+def make_compressor(encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    if encoding == 'br':
+        return BrotliCompressor()
+    return zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip fejléc
+
+def compress_stream(chunks, encoding):
+    """Compresses an iterable of byte chunks on the fly"""
+    compressor = make_compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def is_compressible(filename):
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return get_file_info(filename)[0] == 'code' or ext in COMPRESSIBLE_EXTENSIONS
+
+compressed_cache = OrderedDict()  # (név, kódolás) -> (méret, mtime_ns, tömörített bájtok)
+compressed_cache_bytes = 0
+compressed_cache_lock = threading.Lock()
+
+def get_compressed_variant(path, filename, stat, encoding):
+    """Compressed file content from the LRU cache, compressing it on a miss"""
+    global compressed_cache_bytes
+    key = (filename, encoding)
+    with compressed_cache_lock:
+        entry = compressed_cache.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            compressed_cache.move_to_end(key)
+            return entry[2]
+
+    with open(path, 'rb') as f:
+        data = b''.join(compress_stream(iter(lambda: f.read(256 * 1024), b''), encoding))
+
+    with compressed_cache_lock:
+        old = compressed_cache.pop(key, None)
+        if old:
+            compressed_cache_bytes -= len(old[2])
+        compressed_cache[key] = (stat.st_size, stat.st_mtime_ns, data)
+        compressed_cache_bytes += len(data)
+        while compressed_cache_bytes > COMPRESS_CACHE_MAX_BYTES and len(compressed_cache) > 1:
+            _, evicted = compressed_cache.popitem(last=False)
+            compressed_cache_bytes -= len(evicted[2])
+    return data
+
+def set_attachment_header(response, filename):
+    """Content-Disposition: attachment the way send_file builds it (ASCII fallback + RFC 5987 filename*)"""
+    try:
+        filename.encode('ascii')
+        options = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        options = {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+    response.headers.set('Content-Disposition', 'attachment', **options)
+
+def send_compressed_file(path, filename, stat, encoding):
+    """Download response with a compressed body; small files come from the cache"""
+    if stat.st_size <= COMPRESS_CACHE_MAX_FILE:
+        body = get_compressed_variant(path, filename, stat, encoding)
+    else:
+        # Nagy naplófájlok: menet közben tömörítjük, hossz nélkül (chunked)
+        def generate():
+            with open(path, 'rb') as f:
+                yield from compress_stream(iter(lambda: f.read(256 * 1024), b''), encoding)
+        body = generate()
+    response = Response(body, mimetype=mimetypes.guess_type(filename)[0] or 'text/plain')
+    set_attachment_header(response, os.path.basename(filename))
+    response.content_encoding = encoding
+    return response
+
+@app.after_request
+def compress_json_response(response):
+    """Compresses large JSON responses (e.g. /api/files, /preview) as a stream"""
+    if (response.mimetype != 'application/json' or response.direct_passthrough
+            or response.content_encoding or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.content_length is None or response.content_length < COMPRESS_JSON_MIN_SIZE:
+        return response
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+    data = response.get_data()
+    response.response = compress_stream((data[i:i + 64 * 1024] for i in range(0, len(data), 64 * 1024)), encoding)
+    response.content_length = None
+    response.content_encoding = encoding
+    return response
+
+# --- Tömeges letöltés (streaming ZIP) ---
+
+class ZipStreamSink:
+    """Write-only, unseekable target for zipfile; the response generator drains it.
+
+    Without seek() zipfile writes data descriptors after each member instead of
+    patching the local headers, so the archive can be sent while it is built.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def generate_zip_stream(filenames):
+    """Yields a stored-mode (ZIP64 capable) archive of the given uploads in constant memory"""
+    sink = ZipStreamSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED, allowZip64=True, strict_timestamps=False) as archive:
+        for filename in filenames:
+            path = os.path.join(UPLOAD_FOLDER, filename)
+            try:
+                info = zipfile.ZipInfo.from_file(path, arcname=filename, strict_timestamps=False)
+                src = open(path, 'rb')
+            except OSError:
+                continue  # Időközben törölt fájl
+            with src, archive.open(info, 'w') as dest:
+                for block in iter(lambda: src.read(ZIP_STREAM_BLOCK), b''):
+                    dest.write(block)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
 # --- Chat WebSocket események ---
 
 @socketio.on('connect')
@@ -203,6 +2167,7 @@ def handle_connect():
 def handle_disconnect():
     """Felhasználó kilépése a chat szobából"""
     leave_room('main_chat')
+    unsubscribe_tail(request.sid)
     print('Felhasználó kilépett a chatből')
 
 @socketio.on('send_message')
@@ -375,6 +2340,33 @@ def handle_notes_delete(data):
     except Exception as e:
         print(f'Hiba a jegyzet törlésekor: {e}')
 
+# --- Élő követés WebSocket események ---
+
+@socketio.on('tail_subscribe')
+def handle_tail_subscribe(data):
+    """Egy szöveges fájl élő követése (a tail:<név> szobában)"""
+    requested = str((data or {}).get('filename', ''))
+    filename = '' if is_hidden_path(requested) else secure_filename(requested)
+    path = os.path.join(UPLOAD_FOLDER, filename)
+    if not filename or not os.path.isfile(path) or get_file_info(filename)[0] != 'code':
+        emit('tail_error', {'filename': filename, 'error': 'File cannot be followed'})
+        return
+    try:
+        join_room(f'tail:{filename}')
+        size = subscribe_tail(filename, request.sid)
+    except OSError as e:
+        leave_room(f'tail:{filename}')
+        emit('tail_error', {'filename': filename, 'error': str(e)})
+        return
+    emit('tail_started', {'filename': filename, 'size': size})
+
+@socketio.on('tail_unsubscribe')
+def handle_tail_unsubscribe(data):
+    """Követés vége"""
+    filename = secure_filename((data or {}).get('filename', ''))
+    leave_room(f'tail:{filename}')
+    unsubscribe_tail(request.sid, filename)
+
 
 # --- HTML & JS Sablon ---
 
@@ -608,11 +2600,15 @@ HTML_TEMPLATE = """
                 <div class="space-y-1">
                     <div class="flex justify-between">
                         <span class="text-sm text-gray-600 dark:text-gray-400">Darab:</span>
-                        <span class="text-sm font-medium text-gray-900 dark:text-white">{{ upload_info.count }}</span>
+                        <span id="upload-count" class="text-sm font-medium text-gray-900 dark:text-white">{{ upload_info.count }}</span>
                     </div>
                     <div class="flex justify-between">
                         <span class="text-sm text-gray-600 dark:text-gray-400">Méret:</span>
-                        <span class="text-sm font-medium text-gray-900 dark:text-white">{{ upload_info.size_formatted }}</span>
+                        <span id="upload-size" class="text-sm font-medium text-gray-900 dark:text-white">{{ upload_info.size_formatted }}</span>
+                    </div>
+                    <div class="flex justify-between">
+                        <span class="text-sm text-gray-600 dark:text-gray-400">Lemezen:</span>
+                        <span id="upload-physical-size" class="text-sm font-medium text-gray-900 dark:text-white">{{ upload_info.physical_size_formatted }}</span>
                     </div>
                 </div>
             </div>
@@ -679,6 +2675,11 @@ HTML_TEMPLATE = """
                         <input id="search-input" type="text" placeholder="Keresés..." 
                                class="w-full pl-10 pr-4 py-2 rounded-lg bg-gray-100 dark:bg-gray-800 focus:ring-2 focus:ring-gray-900 dark:focus:ring-white focus:outline-none transition">
                     </div>                    <div class="flex items-center space-x-3 ml-4">
+                        <!-- Bulk Download Button -->
+                        <button id="bulk-download" class="flex items-center justify-center w-10 h-10 rounded-lg bg-gray-100 dark:bg-gray-800 hover:bg-gray-200 dark:hover:bg-gray-700 transition" title="Szűrt fájlok letöltése ZIP-ben">
+                            <i class="fas fa-file-archive text-gray-600 dark:text-gray-400"></i>
+                        </button>
+
                         <!-- Notes Toggle Button -->
                         <button id="notes-toggle" class="flex items-center justify-center w-10 h-10 rounded-lg bg-gray-100 dark:bg-gray-800 hover:bg-gray-200 dark:hover:bg-gray-700 transition" title="Jegyzetfüzet">
                             <i class="fas fa-sticky-note text-gray-600 dark:text-gray-400"></i>
@@ -702,6 +2703,17 @@ HTML_TEMPLATE = """
                             <option value="name_desc">Név Z-A</option>
                             <option value="size_desc">Méret ↓</option>
                             <option value="size_asc">Méret ↑</option>
+                            <option value="type_asc">Típus A-Z</option>
+                            <option value="type_desc">Típus Z-A</option>
+                        </select>
+                        <select id="type-filter" class="bg-gray-100 dark:bg-gray-800 rounded-lg py-2 px-3 focus:ring-2 focus:ring-gray-900 dark:focus:ring-white focus:outline-none transition">
+                            <option value="">Minden típus</option>
+                            <option value="image">Képek</option>
+                            <option value="video">Videók</option>
+                            <option value="audio">Hangok</option>
+                            <option value="pdf">PDF</option>
+                            <option value="code">Szöveg, kód</option>
+                            <option value="other">Egyéb</option>
                         </select>
                         <div class="flex bg-gray-100 dark:bg-gray-800 p-1 rounded-lg">
                             <button id="grid-view-btn" class="view-btn bg-gray-900 dark:bg-white text-white dark:text-gray-900 rounded-md p-2 transition">
@@ -865,19 +2877,125 @@ HTML_TEMPLATE = """
         </div>
     </div>
 
-<script>    const App = {
-        files: {{ files_json | safe }},
+<script>    // SHA-256 hash számítás Web Workerben (a crypto.subtle http-n, LAN címen nem érhető el)
+    function sha256WorkerMain() {
+        const K = new Int32Array([
+            0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+            0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+            0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+            0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+            0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+            0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+            0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+            0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+        ]);
+        const READ_SIZE = 4 * 1024 * 1024;
+
+        class Sha256 {
+            constructor() {
+                this.h = new Int32Array([0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19]);
+                this.w = new Int32Array(64);
+                this.buffer = new Uint8Array(64);
+                this.buffered = 0;
+                this.length = 0;
+            }
+
+            compress(bytes, offset) {
+                const w = this.w, h = this.h;
+                for (let i = 0; i < 16; i++) {
+                    const j = offset + i * 4;
+                    w[i] = (bytes[j] << 24) | (bytes[j + 1] << 16) | (bytes[j + 2] << 8) | bytes[j + 3];
+                }
+                for (let i = 16; i < 64; i++) {
+                    const x = w[i - 15], y = w[i - 2];
+                    const s0 = ((x >>> 7) | (x << 25)) ^ ((x >>> 18) | (x << 14)) ^ (x >>> 3);
+                    const s1 = ((y >>> 17) | (y << 15)) ^ ((y >>> 19) | (y << 13)) ^ (y >>> 10);
+                    w[i] = (w[i - 16] + s0 + w[i - 7] + s1) | 0;
+                }
+                let a = h[0], b = h[1], c = h[2], d = h[3], e = h[4], f = h[5], g = h[6], k = h[7];
+                for (let i = 0; i < 64; i++) {
+                    const S1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7));
+                    const t1 = (k + S1 + ((e & f) ^ (~e & g)) + K[i] + w[i]) | 0;
+                    const S0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10));
+                    const t2 = (S0 + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+                    k = g; g = f; f = e; e = (d + t1) | 0;
+                    d = c; c = b; b = a; a = (t1 + t2) | 0;
+                }
+                h[0] = (h[0] + a) | 0; h[1] = (h[1] + b) | 0; h[2] = (h[2] + c) | 0; h[3] = (h[3] + d) | 0;
+                h[4] = (h[4] + e) | 0; h[5] = (h[5] + f) | 0; h[6] = (h[6] + g) | 0; h[7] = (h[7] + k) | 0;
+            }
+
+            update(bytes) {
+                let offset = 0;
+                this.length += bytes.length;
+                if (this.buffered) {
+                    const take = Math.min(64 - this.buffered, bytes.length);
+                    this.buffer.set(bytes.subarray(0, take), this.buffered);
+                    this.buffered += take;
+                    offset = take;
+                    if (this.buffered < 64) return;
+                    this.compress(this.buffer, 0);
+                    this.buffered = 0;
+                }
+                for (; offset + 64 <= bytes.length; offset += 64) this.compress(bytes, offset);
+                this.buffer.set(bytes.subarray(offset), 0);
+                this.buffered = bytes.length - offset;
+            }
+
+            hex() {
+                const bits = this.length * 8;
+                const padding = new Uint8Array(((this.buffered < 56 ? 56 : 120) - this.buffered) + 8);
+                padding[0] = 0x80;
+                const view = new DataView(padding.buffer);
+                view.setUint32(padding.length - 8, Math.floor(bits / 0x100000000));
+                view.setUint32(padding.length - 4, bits >>> 0);
+                this.update(padding);
+                return Array.from(this.h, x => ('00000000' + (x >>> 0).toString(16)).slice(-8)).join('');
+            }
+        }
+
+        self.onmessage = (e) => {
+            const { id, file } = e.data;
+            try {
+                const reader = new FileReaderSync();
+                const hasher = new Sha256();
+                for (let offset = 0; offset < file.size; offset += READ_SIZE) {
+                    hasher.update(new Uint8Array(reader.readAsArrayBuffer(file.slice(offset, offset + READ_SIZE))));
+                }
+                self.postMessage({ id, sha256: hasher.hex() });
+            } catch (error) {
+                self.postMessage({ id, error: error.message });
+            }
+        };
+    }
+
+    const App = {
+        files: [],
+        filesPage: {{ files_json | safe }},
+        fileCursor: null,
+        fileTotals: { count: 0, total_size: 0 },
+        fileRequest: 0,
+        loadingMore: false,
+        // Ablakos megjelenítés állapota: megjelenített elemek név szerint, újrahasznosítható elemek típusonként
+        virtual: { nodes: new Map(), pool: {}, itemHeight: 0, overscan: 3, poolLimit: 200, frame: null },
+        uploadConfig: {{ upload_config_json | safe }},
         view: 'grid',
         sort: 'date_desc',
         wavesurfer: null,
+        pendingWaveform: null,
+        textViewer: null,
         lastModified: 0,
         fileCount: 0,
+        indexVersion: null,
+        syncPromise: null,
         pollingInterval: null,        init() {
             this.cacheDOMElements();
             this.initTheme();
             this.bindEvents();
             this.loadState();
-            this.renderFiles();
+            this.applyFilesPage(this.filesPage, false);
+            // A beágyazott első oldal az alapértelmezett rendezéshez készül
+            if (this.sort !== 'date_desc') this.refreshFileList();
             this.startSystemMonitoring();
             this.startFilePolling();
         },        cacheDOMElements() {
@@ -887,6 +3005,8 @@ HTML_TEMPLATE = """
                 mobileThemeToggle: document.getElementById('mobile-theme-toggle'),
                 searchInput: document.getElementById('search-input'),
                 sortSelect: document.getElementById('sort-select'),
+                typeFilter: document.getElementById('type-filter'),
+                scrollContainer: document.getElementById('upload-container'),
                 gridViewBtn: document.getElementById('grid-view-btn'),
                 listViewBtn: document.getElementById('list-view-btn'),
                 dropZone: document.getElementById('drop-zone'),
@@ -902,13 +3022,28 @@ HTML_TEMPLATE = """
                 previewLoader: document.getElementById('preview-loader'),
                 previewContent: document.getElementById('preview-content'),
                 notesToggle: document.getElementById('notes-toggle'),
+                bulkDownload: document.getElementById('bulk-download'),
             };
         },        bindEvents() {
             this.dom.themeToggle.addEventListener('click', this.toggleTheme.bind(this));
             this.dom.themeToggleDesktop.addEventListener('click', this.toggleTheme.bind(this));
             this.dom.mobileThemeToggle.addEventListener('click', this.toggleTheme.bind(this));
-            this.dom.searchInput.addEventListener('input', () => this.debounce(this.renderFiles.bind(this), 300)());
-            this.dom.sortSelect.addEventListener('change', (e) => { this.sort = e.target.value; this.renderFiles(); });
+            const search = this.debounce(() => this.refreshFileList(), 300);
+            this.dom.searchInput.addEventListener('input', search);
+            this.dom.sortSelect.addEventListener('change', (e) => { this.sort = e.target.value; this.saveState(); this.refreshFileList(); });
+            this.dom.typeFilter.addEventListener('change', () => this.refreshFileList());
+            // Végtelen görgetés: a következő oldal a lista alja előtt érkezik
+            this.dom.scrollContainer.addEventListener('scroll', () => {
+                this.scheduleVirtualUpdate();
+                this.loadMoreIfNeeded();
+            }, { passive: true });
+            window.addEventListener('resize', () => {
+                // Más oszlopszám és kártyaszélesség: a sormagasságot újramérjük
+                this.virtual.itemHeight = 0;
+                this.dom.fileDisplay.style.gridAutoRows = '';
+                this.scheduleVirtualUpdate();
+            });
+            this.dom.fileDisplay.addEventListener('click', this.onFileDisplayClick.bind(this));
             this.dom.gridViewBtn.addEventListener('click', () => this.setView('grid'));
             this.dom.listViewBtn.addEventListener('click', () => this.setView('list'));
             
@@ -926,6 +3061,7 @@ HTML_TEMPLATE = """
 
             // Notes toggle
             this.dom.notesToggle.addEventListener('click', () => Notes.toggleNotes());
+            this.dom.bulkDownload.addEventListener('click', this.downloadFiltered.bind(this));
         },
 
         initTheme() {
@@ -956,6 +3092,7 @@ HTML_TEMPLATE = """
 
         setView(viewType, shouldRender = true) {
             this.view = viewType;
+            this.resetVirtualList();
             if (viewType === 'grid') {
                 this.dom.gridViewBtn.classList.add('bg-gray-900', 'dark:bg-white', 'text-white', 'dark:text-gray-900');
                 this.dom.gridViewBtn.classList.remove('text-gray-600', 'dark:text-gray-400');
@@ -972,58 +3109,252 @@ HTML_TEMPLATE = """
             if(shouldRender) this.renderFiles();
         },
 
+        // A szűrés és rendezés a szerveren történik; a betöltött oldalak már sorrendben vannak
         getFilteredAndSortedFiles() {
-            const searchTerm = this.dom.searchInput.value.toLowerCase();
-            let filtered = this.files.filter(f => f.name.toLowerCase().includes(searchTerm));
+            return this.files;
+        },
+
+        fileQueryParams() {
+            const params = new URLSearchParams({ sort: this.sort, limit: 200 });
+            const search = this.dom.searchInput.value.trim();
+            if (search) params.set('q', search);
+            if (this.dom.typeFilter.value) params.set('type', this.dom.typeFilter.value);
+            return params;
+        },
 
+        // Ugyanaz a sorrend, mint a szerver rendezett nézeteiben (FileIndex.SORT_KEYS)
+        compareFiles(a, b) {
             const [sortBy, sortDir] = this.sort.split('_');
-            filtered.sort((a, b) => {
-                let valA = a[sortBy];
-                let valB = b[sortBy];
-                if(sortBy === 'name') {
-                    valA = valA.toLowerCase();
-                    valB = valB.toLowerCase();
-                }
-                if (valA < valB) return sortDir === 'asc' ? -1 : 1;
-                if (valA > valB) return sortDir === 'asc' ? 1 : -1;
-                return 0;
-            });
-            return filtered;
+            const key = (f) => {
+                const lower = f.name.toLowerCase();
+                if (sortBy === 'name') return [lower, f.name];
+                if (sortBy === 'type') return [f.preview_type, lower, f.name];
+                return [f[sortBy], lower, f.name];
+            };
+            const keyA = key(a), keyB = key(b);
+            for (let i = 0; i < keyA.length; i++) {
+                if (keyA[i] < keyB[i]) return sortDir === 'asc' ? -1 : 1;
+                if (keyA[i] > keyB[i]) return sortDir === 'asc' ? 1 : -1;
+            }
+            return 0;
+        },
+
+        matchesFileQuery(file) {
+            const search = this.dom.searchInput.value.trim().toLowerCase();
+            const type = this.dom.typeFilter.value;
+            return (!search || file.name.toLowerCase().includes(search)) && (!type || file.preview_type === type);
+        },
+
+        applyFilesPage(page, append) {
+            this.files = append ? this.files.concat(page.files) : page.files;
+            this.fileCursor = page.next_cursor;
+            this.fileTotals = { count: page.count, total_size: page.total_size };
+            if (!append) this.indexVersion = page.version;
+            this.renderFiles();
+            this.updateUploadInfo();
+            this.loadMoreIfNeeded();
+        },
+
+        loadMoreIfNeeded() {
+            const container = this.dom.scrollContainer;
+            if (container.scrollTop + container.clientHeight > container.scrollHeight - 800) this.loadMoreFiles();
         },
 
+        async loadMoreFiles() {
+            if (!this.fileCursor || this.loadingMore) return;
+            this.loadingMore = true;
+            const request = this.fileRequest;
+            let page = null;
+            try {
+                const params = this.fileQueryParams();
+                params.set('cursor', this.fileCursor);
+                const response = await fetch(`/api/files?${params}`);
+                if (!response.ok) throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                page = await response.json();
+            } catch (error) {
+                console.error('Failed to load more files:', error);
+                return;
+            } finally {
+                this.loadingMore = false;
+            }
+            // Közben más rendezés vagy szűrés lett kérve: a régi oldal már nem érvényes
+            if (request !== this.fileRequest) {
+                this.loadMoreIfNeeded();
+                return;
+            }
+            const loaded = new Set(this.files.map(f => f.name));
+            page.files = page.files.filter(f => !loaded.has(f.name));
+            this.applyFilesPage(page, true);
+        },
+
+        // Ablakos megjelenítés: csak a látható sorok (plusz ráhagyás) vannak a DOM-ban, a kihagyott
+        // sorok helyét a lista felső és alsó kitöltése tartja meg, így a görgetősáv a teljes listát mutatja
         renderFiles() {
             this.saveState();
             const files = this.getFilteredAndSortedFiles();
-            this.dom.fileDisplay.innerHTML = '';
+            this.dom.noResults.style.display = files.length === 0 ? 'block' : 'none';
+            this.updateVirtualWindow();
+        },
 
-            if (files.length === 0) {
-                this.dom.noResults.style.display = 'block';
-                return;
-            }
-            this.dom.noResults.style.display = 'none';
+        resetVirtualList() {
+            this.virtual.nodes.forEach(node => this.releaseFileNode(node));
+            this.virtual.nodes.clear();
+            this.virtual.pool = {};
+            this.virtual.itemHeight = 0;
+            this.dom.fileDisplay.replaceChildren();
+            this.dom.fileDisplay.style.gridAutoRows = '';
+        },
 
-            files.forEach(file => {
-                const element = this.view === 'grid' ? this.createGridCard(file) : this.createListItem(file);
-                this.dom.fileDisplay.insertAdjacentHTML('beforeend', element);
+        scheduleVirtualUpdate() {
+            if (this.virtual.frame) return;
+            this.virtual.frame = requestAnimationFrame(() => {
+                this.virtual.frame = null;
+                this.updateVirtualWindow();
             });
-            
-            // Re-bind events to newly created elements
-            document.querySelectorAll('.file-item').forEach(item => {
-                item.addEventListener('click', (e) => {
-                    // Prevent preview on action button click
-                    if (e.target.closest('.file-actions')) return;
-                    const file = this.files.find(f => f.name === item.dataset.name);
-                    this.openPreview(file);
-                });
+        },
+
+        updateVirtualWindow() {
+            const files = this.files;
+            const display = this.dom.fileDisplay;
+            const container = this.dom.scrollContainer;
+            const virtual = this.virtual;
+            const grid = this.view === 'grid';
+            const columns = grid ? Math.max(1, getComputedStyle(display).gridTemplateColumns.split(' ').length) : 1;
+            const gap = grid ? 16 : 8; // gap-4, illetve space-y-2
+            const itemHeight = virtual.itemHeight || (grid ? 220 : 72);
+            const stride = itemHeight + gap;
+
+            // A lista teteje a görgethető tartalomban (felette a feltöltési zóna és a folyamatjelzők vannak)
+            const listTop = display.getBoundingClientRect().top - container.getBoundingClientRect().top + container.scrollTop;
+            const viewTop = container.scrollTop - listTop;
+            const rows = Math.ceil(files.length / columns);
+            const firstRow = Math.min(rows, Math.max(0, Math.floor(viewTop / stride) - virtual.overscan));
+            const lastRow = Math.min(rows, Math.ceil((viewTop + container.clientHeight) / stride) + virtual.overscan);
+            const start = firstRow * columns;
+            const end = Math.min(files.length, Math.max(start, lastRow * columns));
+
+            const wanted = new Map();
+            for (let i = start; i < end; i++) wanted.set(files[i].name, files[i]);
+            // A kilógó elemek a készletbe kerülnek; médiájuk letöltése/dekódolása leáll
+            virtual.nodes.forEach((node, name) => {
+                if (wanted.has(name) && node.fileKind === this.fileNodeKind(wanted.get(name))) return;
+                virtual.nodes.delete(name);
+                this.recycleFileNode(node);
             });
+            const nodes = [];
+            wanted.forEach((file, name) => {
+                let node = virtual.nodes.get(name);
+                if (!node) {
+                    node = this.acquireFileNode(file);
+                    virtual.nodes.set(name, node);
+                } else if (node.file !== file) {
+                    this.fillFileNode(node, file);
+                }
+                nodes.push(node);
+            });
+
+            display.style.paddingTop = `${firstRow * stride}px`;
+            display.style.paddingBottom = `${Math.max(0, rows - Math.max(lastRow, firstRow)) * stride}px`;
+            display.replaceChildren(...nodes);
+
+            // A sormagasságot a megjelenített elemekből mérjük; ha nagyobb a becsültnél, újraszámolunk
+            let measured = 0;
+            nodes.forEach(node => { measured = Math.max(measured, node.offsetHeight, node.scrollHeight); });
+            if (measured > virtual.itemHeight) {
+                virtual.itemHeight = measured;
+                if (grid) display.style.gridAutoRows = `${measured}px`;
+                this.updateVirtualWindow();
+            }
+        },
+
+        // Szerveren kicsinyített kép; a v= paraméter miatt a böngésző a fájl változásáig gyorsítótárazza
+        thumbUrl(file, width) {
+            return `/thumb/${encodeURIComponent(file.name)}?w=${width}&v=${file.date}`;
+        },
+
+        fileNodeKind(file) {
+            if (file.preview_type === 'image') return 'image';
+            return this.view === 'grid' && file.preview_type === 'video' ? 'video' : 'icon';
+        },
+
+        acquireFileNode(file) {
+            const kind = this.fileNodeKind(file);
+            const pool = this.virtual.pool[kind];
+            if (pool && pool.length) {
+                const node = pool.pop();
+                this.fillFileNode(node, file);
+                return node;
+            }
+            const template = document.createElement('template');
+            template.innerHTML = (this.view === 'grid' ? this.createGridCard(file) : this.createListItem(file)).trim();
+            const node = template.content.firstElementChild;
+            node.fileKind = kind;
+            node.file = file;
+            return node;
+        },
+
+        // Újrahasznosított elem feltöltése egy másik fájl adataival, a szerkezet újraépítése nélkül
+        fillFileNode(node, file) {
+            const fileUrl = `/download/${encodeURIComponent(file.name)}`;
+            node.file = file;
+            node.dataset.name = file.name;
+            const name = node.querySelector('[data-field="name"]');
+            name.textContent = file.name;
+            name.title = file.name;
+            node.querySelector('[data-field="size"]').textContent = file.size_formatted;
+            node.querySelector('[data-field="download"]').href = fileUrl;
+            const img = node.querySelector('img');
+            if (img) {
+                img.src = this.thumbUrl(file, this.view === 'grid' ? 320 : 160);
+                img.alt = file.name;
+            }
+            const video = node.querySelector('video');
+            if (video) {
+                video.querySelector('source').src = `${fileUrl}#t=1`;
+                video.load();
+            }
+            const icon = node.querySelector('[data-field="icon"]');
+            if (icon) {
+                icon.classList.remove(...[...icon.classList].filter(name => name.startsWith('fa-')));
+                icon.classList.add(file.icon);
+            }
+        },
+
+        releaseFileNode(node) {
+            const img = node.querySelector('img');
+            if (img) img.removeAttribute('src');
+            const video = node.querySelector('video');
+            if (video) {
+                video.pause();
+                video.querySelector('source').removeAttribute('src');
+                video.load(); // Megszakítja a függő letöltést és felszabadítja a dekódert
+            }
+        },
+
+        recycleFileNode(node) {
+            this.releaseFileNode(node);
+            const pool = this.virtual.pool[node.fileKind] = this.virtual.pool[node.fileKind] || [];
+            if (pool.length < this.virtual.poolLimit) pool.push(node);
+        },
+
+        onFileDisplayClick(e) {
+            const item = e.target.closest('.file-item');
+            if (!item) return;
+            if (e.target.closest('[data-action="delete"]')) {
+                e.stopPropagation();
+                this.deleteFile(item.dataset.name);
+                return;
+            }
+            // Prevent preview on action button click
+            if (e.target.closest('.file-actions')) return;
+            this.openPreview(item.file);
         },
-        
         createGridCard(file) {
             const fileUrl = `/download/${encodeURIComponent(file.name)}`;
             let thumbnailHtml = '';
             
             if (file.preview_type === 'image') {
-                thumbnailHtml = `<img src="${fileUrl}" alt="${file.name}" class="image-thumbnail" loading="lazy">`;
+                thumbnailHtml = `<img src="${this.thumbUrl(file, 320)}" alt="${file.name}" class="image-thumbnail" loading="lazy" decoding="async">`;
             } else if (file.preview_type === 'video') {
                 thumbnailHtml = `
                     <div class="relative">
@@ -1037,7 +3368,7 @@ HTML_TEMPLATE = """
                 `;
             } else {
                 thumbnailHtml = `<div class="w-full h-30 flex items-center justify-center mb-4">
-                    <div class="text-5xl text-gray-400 mb-2"><i class="fas ${file.icon}"></i></div>
+                    <div class="text-5xl text-gray-400 mb-2"><i data-field="icon" class="fas ${file.icon}"></i></div>
                 </div>`;
             }
             
@@ -1045,13 +3376,13 @@ HTML_TEMPLATE = """
                 <div class="file-item file-card cursor-pointer card rounded-xl p-4 flex flex-col shadow-sm" data-name="${file.name}">
                     ${thumbnailHtml}
                     <div class="text-center flex-grow flex flex-col justify-end">
-                        <p class="font-medium text-sm text-gray-800 dark:text-gray-200 mb-1 truncate" title="${file.name}">${file.name}</p>
-                        <p class="text-xs text-gray-500 dark:text-gray-400 mb-3">${file.size_formatted}</p>                        <div class="file-actions flex justify-center space-x-2 text-gray-400 dark:text-gray-500">
-                            <a href="/download/${encodeURIComponent(file.name)}" onclick="event.stopPropagation()" 
+                        <p data-field="name" class="font-medium text-sm text-gray-800 dark:text-gray-200 mb-1 truncate" title="${file.name}">${file.name}</p>
+                        <p data-field="size" class="text-xs text-gray-500 dark:text-gray-400 mb-3">${file.size_formatted}</p>                        <div class="file-actions flex justify-center space-x-2 text-gray-400 dark:text-gray-500">
+                            <a data-field="download" href="${fileUrl}" onclick="event.stopPropagation()" 
                                class="p-2 bg-gray-900 dark:bg-white hover:bg-gray-800 dark:hover:bg-gray-100 text-white dark:text-gray-900 rounded-lg transition" title="Letöltés">
                                 <i class="fas fa-download"></i>
                             </a>
-                            <button onclick="event.stopPropagation(); App.deleteFile('${file.name}')" 
+                            <button data-action="delete" 
                                class="p-2 bg-gray-100 dark:bg-gray-800 hover:bg-gray-200 dark:hover:bg-gray-700 text-gray-900 dark:text-white rounded-lg transition" title="Törlés">
                                 <i class="fas fa-trash"></i>
                             </button>
@@ -1059,16 +3390,15 @@ HTML_TEMPLATE = """
                     </div>
                 </div>`;
         },
-
         createListItem(file) {
             const fileUrl = `/download/${encodeURIComponent(file.name)}`;
             let thumbnailHtml = '';
             
             if (file.preview_type === 'image') {
-                thumbnailHtml = `<img src="${fileUrl}" alt="${file.name}" class="w-12 h-12 object-cover rounded-lg mr-3" loading="lazy">`;
+                thumbnailHtml = `<img src="${this.thumbUrl(file, 160)}" alt="${file.name}" class="w-12 h-12 object-cover rounded-lg mr-3" loading="lazy" decoding="async">`;
             } else {
                 thumbnailHtml = `<div class="w-12 h-12 flex items-center justify-center bg-gray-100 dark:bg-gray-800 rounded-lg mr-3">
-                    <i class="fas ${file.icon} text-xl text-gray-400"></i>
+                    <i data-field="icon" class="fas ${file.icon} text-xl text-gray-400"></i>
                 </div>`;
             }
             
@@ -1077,15 +3407,15 @@ HTML_TEMPLATE = """
                     <div class="flex items-center min-w-0 flex-grow">
                         ${thumbnailHtml}
                         <div class="min-w-0 flex-grow">
-                            <p class="font-medium text-gray-800 dark:text-gray-200 truncate" title="${file.name}">${file.name}</p>
-                            <p class="text-sm text-gray-500 dark:text-gray-400">${file.size_formatted}</p>
+                            <p data-field="name" class="font-medium text-gray-800 dark:text-gray-200 truncate" title="${file.name}">${file.name}</p>
+                            <p data-field="size" class="text-sm text-gray-500 dark:text-gray-400">${file.size_formatted}</p>
                         </div>
                     </div>                    <div class="file-actions flex space-x-2 flex-shrink-0 ml-4">
-                        <a href="/download/${encodeURIComponent(file.name)}" onclick="event.stopPropagation()" 
+                        <a data-field="download" href="${fileUrl}" onclick="event.stopPropagation()" 
                            class="p-2 bg-gray-900 dark:bg-white hover:bg-gray-800 dark:hover:bg-gray-100 text-white dark:text-gray-900 rounded-lg transition" title="Letöltés">
                             <i class="fas fa-download"></i>
                         </a>
-                        <button onclick="event.stopPropagation(); App.deleteFile('${file.name}')" 
+                        <button data-action="delete" 
                            class="p-2 bg-gray-100 dark:bg-gray-800 hover:bg-gray-200 dark:hover:bg-gray-700 text-gray-900 dark:text-white rounded-lg transition" title="Törlés">
                             <i class="fas fa-trash"></i>
                         </button>
@@ -1093,6 +3423,30 @@ HTML_TEMPLATE = """
                 </div>`;
         },
         
+        loadProgressiveImage(file, fileUrl) {
+            const image = document.getElementById('preview-image');
+            let token = this.previewToken = (this.previewToken || 0) + 1;
+            const sharpen = (src, expected) => {
+                if (expected !== this.previewToken) return; // Közben másik előnézet vagy az eredeti lett kérve
+                image.src = src;
+                image.style.filter = '';
+            };
+            // A böngésző a srcset-ből a modal szélességéhez és a kijelző sűrűségéhez illőt választja
+            const full = new Image();
+            full.sizes = '(max-width: 1024px) 100vw, 1024px';
+            full.srcset = this.uploadConfig.preview_widths.map(w => `${this.thumbUrl(file, w)} ${w}w`).join(', ');
+            full.decode().then(() => sharpen(full.currentSrc, token)).catch(() => sharpen(fileUrl, token));
+            document.getElementById('preview-original').addEventListener('click', (e) => {
+                e.currentTarget.remove();
+                token = this.previewToken = this.previewToken + 1;
+                const expected = token;
+                image.style.filter = 'blur(2px)';
+                const original = new Image();
+                original.src = fileUrl;
+                original.decode().then(() => sharpen(fileUrl, expected)).catch(() => sharpen(image.src, expected));
+            });
+        },
+
         async openPreview(file) {
             this.dom.previewModal.classList.remove('hidden');
             document.body.style.overflow = 'hidden';
@@ -1107,7 +3461,15 @@ HTML_TEMPLATE = """
             
             switch(file.preview_type) {
                 case 'image':
-                    contentHTML = `<img src="${fileUrl}" class="max-w-full max-h-full mx-auto object-contain rounded-xl">`;
+                    // Előbb a (rácsnézetből már gyorsítótárban lévő) kis kép, majd a képernyőhöz illő változat
+                    contentHTML = `
+                        <div class="relative">
+                            <img id="preview-image" src="${this.thumbUrl(file, 320)}" alt="${file.name}"
+                                 class="w-full max-h-[75vh] mx-auto object-contain rounded-xl transition" style="filter: blur(8px);">
+                            <button id="preview-original" class="absolute bottom-3 right-3 px-3 py-1 text-sm bg-black/60 hover:bg-black/80 text-white rounded-lg transition" title="Eredeti felbontás betöltése">
+                                <i class="fas fa-expand mr-1"></i>Eredeti
+                            </button>
+                        </div>`;
                     break;
                 case 'video':
                     contentHTML = `<video src="${fileUrl}" controls autoplay class="w-full h-full rounded-xl"></video>`;
@@ -1118,17 +3480,26 @@ HTML_TEMPLATE = """
                 case 'pdf':
                     contentHTML = `<iframe src="${fileUrl}" class="w-full h-[75vh] rounded-xl" frameborder="0"></iframe>`;
                     break;
-                case 'code':
-                    try {
-                        const response = await fetch(`/preview/${encodeURIComponent(file.name)}`);
-                        if (!response.ok) throw new Error('File content could not be loaded.');
-                        const data = await response.json();
-                        const lang = file.name.split('.').pop();
-                        contentHTML = `<pre class="language-${lang} rounded-xl"><code class="language-${lang}">${Prism.highlight(data.content, Prism.languages[lang] || Prism.languages.clike, lang)}</code></pre>`;
-                    } catch (error) {
-                        contentHTML = `<p class="text-red-500">Hiba a fájl tartalmának betöltésekor: ${error.message}</p>`;
-                    }
+                case 'code': {
+                    // Ablakos nézet: csak a látható sorok töltődnek le és kapnak kiemelést
+                    const lang = file.name.split('.').pop();
+                    contentHTML = `
+                        <div class="rounded-xl border border-gray-200 dark:border-gray-700 overflow-hidden">
+                            <div class="flex items-center gap-3 px-3 py-2 border-b border-gray-200 dark:border-gray-700 text-sm">
+                                <span id="text-viewer-info" class="text-gray-500 dark:text-gray-400">Betöltés...</span>
+                                <label class="ml-auto flex items-center gap-1 text-gray-600 dark:text-gray-300" title="A fájlhoz hozzáírt sorok azonnal megjelennek">
+                                    <input id="text-viewer-follow" type="checkbox"> Élő követés
+                                </label>
+                                <input id="text-viewer-goto" type="number" min="1" placeholder="Ugrás sorra"
+                                       class="w-36 px-2 py-1 rounded-lg bg-gray-100 dark:bg-gray-800 text-gray-900 dark:text-white">
+                            </div>
+                            <div id="text-viewer-scroll" class="relative h-[70vh] overflow-auto">
+                                <pre id="text-viewer-lines" class="language-${lang} sticky top-0" style="margin: 0; padding: 0; border-radius: 0; overflow: visible;"></pre>
+                                <div id="text-viewer-spacer"></div>
+                            </div>
+                        </div>`;
                     break;
+                }
                 default:
                     contentHTML = `<div class="text-center p-16"><i class="fas ${file.icon} text-6xl text-gray-400 mb-4"></i><p class="text-lg text-gray-600 dark:text-gray-400">Ehhez a fájltípushoz nincs elérhető előnézet.</p></div>`;
             }
@@ -1137,25 +3508,276 @@ HTML_TEMPLATE = """
             this.dom.previewContent.innerHTML = contentHTML;
             this.dom.previewContent.style.display = 'block';
 
-            if (file.preview_type === 'audio') {
-                if (this.wavesurfer) this.wavesurfer.destroy();
-                this.wavesurfer = WaveSurfer.create({
-                    container: '#waveform',
-                    waveColor: '#6b7280',
-                    progressColor: '#111827',
-                    url: fileUrl,
-                    barWidth: 3,
-                    barRadius: 3,
-                    height: 100,
-                });
-                this.wavesurfer.on('ready', () => this.wavesurfer.play());
+            if (file.preview_type === 'image') this.loadProgressiveImage(file, fileUrl);
+
+            if (file.preview_type === 'audio') this.loadWaveform(file, fileUrl);
+            if (file.preview_type === 'code') this.openTextViewer(file);
+        },
+
+        // --- Szöveges előnézet: soronkénti ablakok a szerver sorindexéből, állandó memóriával ---
+        openTextViewer(file) {
+            const lang = file.name.split('.').pop();
+            const viewer = this.textViewer = {
+                file,
+                grammar: Prism.languages[lang] || Prism.languages.clike,
+                lang,
+                total: 0,
+                lineHeight: 20,
+                blockSize: 200,
+                maxBlocks: 30,
+                maxHeight: 4000000, // A böngészők elemmagasság-korlátja alatt; nagyobb fájlnál a görgetés arányos
+                blocks: new Map(),
+                loading: new Set(),
+                truncated: new Set(),
+                highlight: null,
+                frame: null,
+                following: false,
+                size: null, // Követés közben: ennyi bájtot látunk a fájlból (a lekérések is eddig olvasnak)
+                endsWithNewline: true,
+                ready: true,
+            };
+            const scroll = document.getElementById('text-viewer-scroll');
+            scroll.addEventListener('scroll', () => this.scheduleTextRender(viewer), { passive: true });
+            document.getElementById('text-viewer-goto').addEventListener('keydown', (e) => {
+                if (e.key === 'Enter') this.gotoTextLine(parseInt(e.target.value, 10));
+            });
+            const follow = document.getElementById('text-viewer-follow');
+            follow.disabled = !this.hasLiveFileEvents();
+            follow.addEventListener('change', (e) => this.setTextFollowing(viewer, e.target.checked));
+            this.loadTextBlock(viewer, 0);
+        },
+
+        async loadTextBlock(viewer, block) {
+            if (viewer.blocks.has(block) || viewer.loading.has(block)) return;
+            viewer.loading.add(block);
+            try {
+                const from = block * viewer.blockSize + 1;
+                const until = viewer.size === null ? '' : `&until=${viewer.size}`;
+                const response = await fetch(`/preview/${encodeURIComponent(viewer.file.name)}?from_line=${from}&count=${viewer.blockSize}${until}`);
+                if (!response.ok) throw new Error((await response.json()).error || 'File content could not be loaded.');
+                const data = await response.json();
+                if (viewer !== this.textViewer) return;
+                if (viewer.size !== null && data.size !== viewer.size) {
+                    // Közben új bájtok érkeztek vagy a fájl újraindult: a blokkot az aktuális állapotra kérjük újra
+                    this.scheduleTextRender(viewer);
+                    return;
+                }
+                viewer.blocks.set(block, data.lines);
+                viewer.endsWithNewline = data.ends_with_newline;
+                data.truncated.forEach(line => viewer.truncated.add(line));
+                while (viewer.blocks.size > viewer.maxBlocks) viewer.blocks.delete(viewer.blocks.keys().next().value);
+                if (data.total_lines !== viewer.total) {
+                    viewer.total = data.total_lines;
+                    this.layoutTextViewer(viewer);
+                }
+                if (!viewer.ready) {
+                    viewer.ready = true;
+                    if (viewer.following) this.scrollTextToEnd(viewer);
+                }
+                this.scheduleTextRender(viewer);
+            } catch (error) {
+                if (viewer === this.textViewer) {
+                    document.getElementById('text-viewer-info').textContent = `Hiba a fájl tartalmának betöltésekor: ${error.message}`;
+                }
+            } finally {
+                viewer.loading.delete(block);
+            }
+        },
+
+        layoutTextViewer(viewer) {
+            const scroll = document.getElementById('text-viewer-scroll');
+            const height = Math.min(viewer.total * viewer.lineHeight, viewer.maxHeight);
+            document.getElementById('text-viewer-spacer').style.height = `${Math.max(0, height - scroll.clientHeight)}px`;
+        },
+
+        // A görgetési pozíció és az első látható sor kölcsönösen egymásra képezhető (skálázott magasságnál is)
+        textScrollRange(viewer, scroll) {
+            const visible = Math.max(1, Math.floor(scroll.clientHeight / viewer.lineHeight));
+            return { visible, maxFirst: Math.max(0, viewer.total - visible), maxScroll: Math.max(0, scroll.scrollHeight - scroll.clientHeight) };
+        },
+
+        scheduleTextRender(viewer) {
+            if (viewer.frame) return;
+            viewer.frame = requestAnimationFrame(() => {
+                viewer.frame = null;
+                if (viewer === this.textViewer) this.renderTextViewer(viewer);
+            });
+        },
+
+        renderTextViewer(viewer) {
+            const scroll = document.getElementById('text-viewer-scroll');
+            const { visible, maxFirst, maxScroll } = this.textScrollRange(viewer, scroll);
+            const first = maxScroll ? Math.min(maxFirst, Math.round(scroll.scrollTop / maxScroll * maxFirst)) : 0;
+            const last = Math.min(viewer.total, first + visible + 1);
+            const digits = String(viewer.total).length;
+            const rows = [];
+            for (let line = first; line < last; line++) {
+                const block = Math.floor(line / viewer.blockSize);
+                const lines = viewer.blocks.get(block);
+                let text = '';
+                if (lines) {
+                    viewer.blocks.delete(block);
+                    viewer.blocks.set(block, lines); // LRU: a látható blokkok maradnak meg
+                    text = Prism.highlight(lines[line - block * viewer.blockSize] || '', viewer.grammar, viewer.lang);
+                    if (viewer.truncated.has(line + 1)) text += ' <span class="text-gray-400">[…]</span>';
+                } else {
+                    this.loadTextBlock(viewer, block);
+                    text = '<span class="text-gray-400">…</span>';
+                }
+                const marked = line + 1 === viewer.highlight ? ' bg-yellow-200/20' : '';
+                rows.push(`<div class="flex${marked}" style="height: ${viewer.lineHeight}px; line-height: ${viewer.lineHeight}px;"><span class="select-none text-gray-400 text-right pr-4 shrink-0" style="width: ${digits + 3}ch;">${line + 1}</span><code class="language-${viewer.lang}" style="white-space: pre;">${text}</code></div>`);
+            }
+            document.getElementById('text-viewer-lines').innerHTML = rows.join('');
+            document.getElementById('text-viewer-info').textContent = viewer.total
+                ? `${(first + 1).toLocaleString()}–${last.toLocaleString()}. sor / ${viewer.total.toLocaleString()}`
+                : 'Üres fájl';
+        },
+
+        // --- Élő követés: a szerver csak a hozzáírt bájtokat küldi, ezeket a gyorsítótárazott blokkokba fűzzük ---
+        setTextFollowing(viewer, following) {
+            if (!this.fileSocket) return;
+            viewer.following = following;
+            const payload = { filename: viewer.file.name };
+            if (following) {
+                this.fileSocket.emit('tail_subscribe', payload);
+            } else {
+                this.fileSocket.emit('tail_unsubscribe', payload);
+                viewer.size = null;
+            }
+        },
+
+        followedTextViewer(data) {
+            const viewer = this.textViewer;
+            return viewer && viewer.following && data.filename === viewer.file.name ? viewer : null;
+        },
+
+        // Új kiindulópont (feliratkozás, csonkolás, forgatás): a látható részt a megadott méretig újratöltjük
+        resetTextViewer(viewer, size) {
+            viewer.size = size;
+            viewer.blocks.clear();
+            viewer.truncated.clear();
+            viewer.ready = false;
+            this.loadTextBlock(viewer, 0);
+            this.scheduleTextRender(viewer);
+        },
+
+        onTailData(data) {
+            const viewer = this.followedTextViewer(data);
+            if (!viewer) return;
+            if (!viewer.ready || data.offset !== viewer.size) {
+                this.resetTextViewer(viewer, data.size); // Lemaradtunk: újratöltés az új méretig
+                return;
+            }
+            const scroll = document.getElementById('text-viewer-scroll');
+            const atEnd = scroll.scrollTop >= scroll.scrollHeight - scroll.clientHeight - 2;
+            const segments = data.data.split('\\n');
+            const start = viewer.endsWithNewline ? viewer.total : viewer.total - 1;
+            segments.forEach((segment, i) => {
+                const complete = i < segments.length - 1;
+                if (!complete && segment === '') return;
+                const line = start + i;
+                const block = Math.floor(line / viewer.blockSize);
+                const pos = line - block * viewer.blockSize;
+                let lines = viewer.blocks.get(block);
+                if (!lines && pos === 0 && line >= viewer.total) viewer.blocks.set(block, lines = []);
+                if (!lines || pos > lines.length) return; // Nincs betöltve: görgetéskor a szerverről jön
+                let text = (i === 0 && !viewer.endsWithNewline ? (lines[pos] || '') : '') + segment;
+                if (complete && text.endsWith('\\r')) text = text.slice(0, -1);
+                lines[pos] = text;
+            });
+            viewer.total = start + segments.length - (segments[segments.length - 1] === '' ? 1 : 0);
+            viewer.endsWithNewline = data.data.endsWith('\\n');
+            viewer.size = data.size;
+            this.layoutTextViewer(viewer);
+            if (atEnd) this.scrollTextToEnd(viewer);
+            this.scheduleTextRender(viewer);
+        },
+
+        scrollTextToEnd(viewer) {
+            const scroll = document.getElementById('text-viewer-scroll');
+            scroll.scrollTop = scroll.scrollHeight;
+            this.scheduleTextRender(viewer);
+        },
+
+        gotoTextLine(line) {
+            const viewer = this.textViewer;
+            if (!viewer || !viewer.total || !Number.isFinite(line)) return;
+            line = Math.min(Math.max(line, 1), viewer.total);
+            const scroll = document.getElementById('text-viewer-scroll');
+            const { maxFirst, maxScroll } = this.textScrollRange(viewer, scroll);
+            viewer.highlight = line;
+            scroll.scrollTop = maxFirst ? Math.min(line - 1, maxFirst) / maxFirst * maxScroll : 0;
+            this.scheduleTextRender(viewer);
+        },
+
+        // A hullámformát a szerver számolja; a böngésző csak a csúcsokat rajzolja, a hangot tartománykérésekkel streameli
+        async loadWaveform(file, fileUrl) {
+            const token = this.previewToken = (this.previewToken || 0) + 1;
+            this.pendingWaveform = null;
+            let response = null;
+            try {
+                response = await fetch(`/peaks/${encodeURIComponent(file.name)}?v=${file.date}`);
+            } catch (error) { /* Hullámforma nélkül is lejátszható */ }
+            if (token !== this.previewToken) return;
+            if (response && response.status === 202) {
+                // Hosszú felvétel: amíg a háttérfeladat dolgozik, sima lejátszó szól, utána ugyanez az elem kap hullámformát
+                document.getElementById('waveform').innerHTML = `
+                    <audio id="waveform-audio" src="${fileUrl}" controls autoplay preload="metadata" class="w-full"></audio>
+                    <p id="waveform-pending" class="mt-2 text-sm text-gray-500 dark:text-gray-400"><i class="fas fa-spinner fa-spin mr-1"></i>Hullámforma készül...</p>`;
+                this.pendingWaveform = { name: file.name, file, fileUrl, token };
+                return;
+            }
+            let peaks = null;
+            if (response && response.ok) {
+                try { peaks = await response.json(); } catch (error) { peaks = null; }
+                if (token !== this.previewToken) return;
             }
+            this.createWaveform(fileUrl, peaks, null);
+        },
+
+        createWaveform(fileUrl, peaks, media) {
+            if (this.wavesurfer) this.wavesurfer.destroy();
+            const options = {
+                container: '#waveform',
+                waveColor: '#6b7280',
+                progressColor: '#111827',
+                barWidth: 3,
+                barRadius: 3,
+                height: 100,
+            };
+            // Csúcsokkal és hosszal a WaveSurfer nem tölti le és nem dekódolja a teljes fájlt
+            if (peaks) Object.assign(options, { peaks: [peaks.peaks], duration: peaks.duration });
+            if (media) options.media = media;
+            else options.url = fileUrl;
+            this.wavesurfer = WaveSurfer.create(options);
+            if (!media) this.wavesurfer.on('ready', () => this.wavesurfer.play());
+        },
+
+        async onPeaksReady(data) {
+            const pending = this.pendingWaveform;
+            if (!pending || data.filename !== pending.name || pending.token !== this.previewToken) return;
+            try {
+                const response = await fetch(`/peaks/${encodeURIComponent(pending.name)}?v=${pending.file.date}`);
+                if (!response.ok) return;
+                const peaks = await response.json();
+                if (this.pendingWaveform !== pending || pending.token !== this.previewToken) return;
+                this.pendingWaveform = null;
+                // A már szóló elemet adjuk át, így a lejátszás nem szakad meg
+                const audio = document.getElementById('waveform-audio');
+                audio.controls = false;
+                audio.classList.add('hidden');
+                document.getElementById('waveform-pending').remove();
+                this.createWaveform(pending.fileUrl, peaks, audio);
+            } catch (error) { /* Marad a sima lejátszó */ }
         },
 
         closePreview() {
             this.dom.previewModal.classList.add('hidden');
             document.body.style.overflow = 'auto';
             this.dom.previewContent.innerHTML = '';
+            this.pendingWaveform = null;
+            if (this.textViewer && this.textViewer.following) this.setTextFollowing(this.textViewer, false);
+            this.textViewer = null;
             if (this.wavesurfer) {
                 this.wavesurfer.destroy();
                 this.wavesurfer = null;
@@ -1165,15 +3787,209 @@ HTML_TEMPLATE = """
         // --- Feltöltés ---
         preventDefaults(e) { e.preventDefault(); e.stopPropagation(); },
 
-        handleFiles(files) {
+        async handleFiles(files) {
             if (!files.length) return;
-            [...files].forEach(this.uploadFile.bind(this));
+            files = [...files];
+            const hashable = files.filter(f => f.size > 0 && f.size <= this.uploadConfig.precheck_max_size);
+            this.uploadFiles(files.filter(f => !hashable.includes(f)));
+            if (!hashable.length) return;
+
+            // Hash-elés után csak a szerveren még nem létező tartalmat töltjük fel
+            let existing = new Map();
+            try {
+                existing = await this.precheckFiles(hashable);
+            } catch (error) {
+                console.log('Hash pre-check failed, uploading everything:', error);
+            }
+            let linked = 0;
+            const missing = [];
+            for (const file of hashable) {
+                if (existing.has(file) && await this.linkExistingFile(file, existing.get(file))) {
+                    linked++;
+                } else {
+                    missing.push(file);
+                }
+            }
+            this.uploadFiles(missing);
+            if (linked) {
+                if (!this.hasLiveFileEvents()) {
+                    await this.refreshFileList();
+                    await this.updatePollingState();
+                }
+                this.showNotification(`${linked} fájl már megvolt a szerveren, feltöltés nélkül hozzáadva`, 'success');
+            }
+        },
+
+        // Sok kis fájl egy tar folyamként, a többi egyenként
+        uploadFiles(files) {
+            const cfg = this.uploadConfig;
+            const small = files.filter(f => f.size <= cfg.batch_max_file_size);
+            if (small.length < cfg.batch_min_files) {
+                files.forEach(this.uploadFile.bind(this));
+                return;
+            }
+            files.filter(f => f.size > cfg.batch_max_file_size).forEach(this.uploadFile.bind(this));
+            let batch = [], batchBytes = 0;
+            for (const file of small) {
+                if (batch.length && batchBytes + file.size > cfg.batch_max_bytes) {
+                    this.uploadBatch(batch);
+                    batch = [];
+                    batchBytes = 0;
+                }
+                batch.push(file);
+                batchBytes += file.size;
+            }
+            if (batch.length) this.uploadBatch(batch);
+        },
+
+        uploadBatch(files) {
+            const progressId = this.createProgressItem({ name: `${files.length} fájl egy csomagban` });
+            UploadQueue.add({ progressId, run: () => this.sendBatch(files, progressId) });
+        },
+
+        sendBatch(files, progressId) {
+            return new Promise((resolve, reject) => {
+                const xhr = new XMLHttpRequest();
+                xhr.open('POST', '/api/uploads/batch', true);
+                xhr.setRequestHeader('Content-Type', 'application/x-tar');
+                xhr.upload.addEventListener('progress', e => {
+                    if (e.lengthComputable) this.setProgress(progressId, e.loaded, e.total);
+                });
+                xhr.addEventListener('load', () => {
+                    if (xhr.status === 200) resolve();
+                    else reject(this.uploadError(xhr.status));
+                });
+                xhr.addEventListener('error', () => reject(this.uploadError(0)));
+                xhr.send(this.buildTarBlob(files));
+            });
+        },
+
+        // POSIX (ustar + pax) tar összeállítása; a Blob csak hivatkozik a fájlokra, nem másolja őket
+        buildTarBlob(files) {
+            const encoder = new TextEncoder();
+            const parts = [];
+            const pad = (size) => {
+                const rest = size % 512;
+                if (rest) parts.push(new Uint8Array(512 - rest));
+            };
+            const header = (name, size, mtime, type) => {
+                const block = new Uint8Array(512);
+                const put = (offset, text) => block.set(encoder.encode(text), offset);
+                const octal = (value, length) => value.toString(8).padStart(length - 1, '0');
+                put(0, name);
+                put(100, octal(0o644, 8));
+                put(108, octal(0, 8));
+                put(116, octal(0, 8));
+                put(124, octal(size, 12));
+                put(136, octal(mtime, 12));
+                put(148, '        ');
+                put(156, type);
+                put(257, 'ustar');
+                put(263, '00');
+                const checksum = block.reduce((sum, byte) => sum + byte, 0);
+                put(148, octal(checksum, 7));
+                block[154] = 0;
+                return block;
+            };
+            for (const file of files) {
+                const mtime = Math.floor((file.lastModified || Date.now()) / 1000);
+                const name = encoder.encode(file.name);
+                // Hosszú vagy nem ASCII nevet pax kiterjesztett fejléc visz át
+                if (name.length > 99 || name.length !== file.name.length) {
+                    const body = ` path=${file.name}\\n`;
+                    const base = encoder.encode(body).length;
+                    let length = base + String(base).length;
+                    if (String(length).length !== String(base).length) length = base + String(length).length;
+                    const record = encoder.encode(length + body);
+                    parts.push(header('PaxHeader', record.length, mtime, 'x'), record);
+                    pad(record.length);
+                }
+                const asciiName = file.name.replace(/[^ -~]/g, '_').slice(0, 99);
+                parts.push(header(asciiName, file.size, mtime, '0'), file);
+                pad(file.size);
+            }
+            parts.push(new Uint8Array(1024));
+            return new Blob(parts, { type: 'application/x-tar' });
+        },
+
+        getHashWorker() {
+            if (!this.hashWorker) {
+                const source = `(${sha256WorkerMain.toString()})()`;
+                this.hashWorker = new Worker(URL.createObjectURL(new Blob([source], { type: 'text/javascript' })));
+                this.hashJobs = new Map();
+                this.hashWorker.onmessage = (e) => {
+                    const job = this.hashJobs.get(e.data.id);
+                    this.hashJobs.delete(e.data.id);
+                    if (e.data.error) job.reject(new Error(e.data.error));
+                    else job.resolve(e.data.sha256);
+                };
+            }
+            return this.hashWorker;
+        },
+
+        hashFile(file) {
+            const worker = this.getHashWorker();
+            const id = Math.random().toString(36).substring(2, 11);
+            return new Promise((resolve, reject) => {
+                this.hashJobs.set(id, { resolve, reject });
+                worker.postMessage({ id, file });
+            });
+        },
+
+        async precheckFiles(files) {
+            const hashes = [];
+            for (const file of files) {
+                hashes.push(await this.hashFile(file));
+            }
+            const existing = new Map();
+            const batchSize = this.uploadConfig.precheck_max_batch;
+            for (let i = 0; i < files.length; i += batchSize) {
+                const batch = files.slice(i, i + batchSize);
+                const response = await fetch('/api/files/precheck', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ files: batch.map((f, j) => ({ size: f.size, sha256: hashes[i + j] })) })
+                });
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                const data = await response.json();
+                data.results.forEach((result, j) => {
+                    if (result.exists) existing.set(batch[j], hashes[i + j]);
+                });
+            }
+            return existing;
+        },
+
+        async linkExistingFile(file, sha256) {
+            try {
+                const response = await fetch('/api/files/link', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ filename: file.name, size: file.size, sha256 })
+                });
+                return response.ok;
+            } catch (error) {
+                return false;
+            }
         },
         
         uploadFile(file) {
-            const formData = new FormData();
-            formData.append('files[]', file);
+            const progressId = this.createProgressItem(file);
+            UploadQueue.add({
+                progressId,
+                run: () => file.size > this.uploadConfig.chunked_threshold
+                    ? this.uploadFileChunked(file, progressId)
+                    : this.uploadFileSimple(file, progressId)
+            });
+        },
+
+        uploadError(status) {
+            const error = new Error(status ? `HTTP ${status}` : 'Network error');
+            // Hálózati hiba, időtúllépés, túlterhelés és szerverhiba esetén érdemes újrapróbálni
+            error.transient = !status || status === 408 || status === 429 || (status >= 500 && status !== 507);
+            return error;
+        },
 
+        createProgressItem(file) {
             const progressId = `progress-${Math.random().toString(36).substring(2, 9)}`;
             const progressHTML = `
                 <div id="wrapper-${progressId}" class="card p-4 rounded-xl shadow-sm">
@@ -1187,46 +4003,169 @@ HTML_TEMPLATE = """
                 </div>
             `;
             this.dom.progressContainer.insertAdjacentHTML('beforeend', progressHTML);
-            
-            const xhr = new XMLHttpRequest();
-            xhr.open('POST', '/', true);
-
-            xhr.upload.addEventListener('progress', e => {
-                if (e.lengthComputable) {
-                    const percent = Math.round((e.loaded / e.total) * 100);
-                    document.getElementById(progressId).style.width = percent + '%';
-                    document.getElementById(`percent-${progressId}`).textContent = percent + '%';
-                }
-            });            xhr.addEventListener('load', async (e) => {
-                console.log('Upload completed with status:', xhr.status);
-                const bar = document.getElementById(progressId);
-                const wrapper = document.getElementById(`wrapper-${progressId}`);
-                if (xhr.status === 200) {
-                    console.log('Upload successful, refreshing file list...');
-                    bar.className = 'bg-green-600 h-2 rounded-full transition-all duration-300';
-                    document.getElementById(`percent-${progressId}`).textContent = 'Kész!';
-                    setTimeout(() => {
-                        wrapper.style.opacity = '0';
-                        setTimeout(() => wrapper.remove(), 300);
-                    }, 1000);
-                      // Refresh file list without page reload
+            return progressId;
+        },
+
+        setProgressLabel(progressId, text) {
+            const label = document.getElementById(`percent-${progressId}`);
+            if (label) label.textContent = text;
+        },
+
+        setProgress(progressId, loaded, total) {
+            UploadQueue.recordProgress(progressId, loaded);
+            const percent = total ? Math.round((loaded / total) * 100) : 100;
+            document.getElementById(progressId).style.width = percent + '%';
+            document.getElementById(`percent-${progressId}`).textContent = percent + '%';
+        },
+
+        uploadFileSimple(file, progressId) {
+            return new Promise((resolve, reject) => {
+                const formData = new FormData();
+                formData.append('files[]', file);
+
+                const xhr = new XMLHttpRequest();
+                xhr.open('POST', '/', true);
+                xhr.upload.addEventListener('progress', e => {
+                    if (e.lengthComputable) this.setProgress(progressId, e.loaded, e.total);
+                });
+                xhr.addEventListener('load', () => {
+                    console.log('Upload completed with status:', xhr.status);
+                    if (xhr.status === 200) resolve();
+                    else reject(this.uploadError(xhr.status));
+                });
+                xhr.addEventListener('error', () => reject(this.uploadError(0)));
+                xhr.send(formData);
+            });
+        },
+
+        // Nagy fájlok: darabolt, folytatható feltöltés (/api/uploads)
+        async uploadFileChunked(file, progressId) {
+            const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+            let session = null;
+            const savedId = localStorage.getItem(resumeKey);
+            if (savedId) {
+                const response = await fetch(`/api/uploads/${savedId}`);
+                if (response.ok) session = await response.json();
+            }
+            if (!session) {
+                const response = await fetch('/api/uploads', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ filename: file.name, size: file.size })
+                });
+                if (!response.ok) throw this.uploadError(response.status);
+                session = await response.json();
+                localStorage.setItem(resumeKey, session.id);
+            } else {
+                console.log(`Resuming upload ${session.id}, ${session.received_chunks.length}/${session.total_chunks} chunks stored`);
+            }
+
+            const received = new Set(session.received_chunks);
+            const chunkBytes = (index) => Math.min(session.chunk_size, file.size - index * session.chunk_size);
+            let uploadedBytes = session.received_chunks.reduce((sum, index) => sum + chunkBytes(index), 0);
+            const inFlight = new Map();
+            const reportProgress = () => {
+                let loaded = uploadedBytes;
+                inFlight.forEach(bytes => loaded += bytes);
+                this.setProgress(progressId, loaded, file.size);
+            };
+            reportProgress();
+
+            // Több párhuzamos kapcsolat veszi a következő hiányzó darabot
+            const pending = [];
+            for (let index = 0; index < session.total_chunks; index++) {
+                if (!received.has(index)) pending.push(index);
+            }
+            const streamWorker = async () => {
+                while (pending.length) {
+                    const index = pending.shift();
+                    const start = index * session.chunk_size;
+                    const blob = file.slice(start, start + chunkBytes(index));
                     try {
-                        await App.refreshFileList();
-                        // Update polling state immediately to prevent duplicate notifications
-                        await App.updatePollingState();
-                        App.showNotification('Fájl sikeresen feltöltve!', 'success');
+                        await this.putChunkWithRetry(session.id, index, blob, (loaded) => {
+                            inFlight.set(index, loaded);
+                            reportProgress();
+                        });
                     } catch (error) {
-                        console.error('Failed to refresh file list after upload:', error);
-                        App.showNotification('Fájl feltöltve, de a lista frissítése sikertelen. Frissítsd az oldalt!', 'warning');
+                        pending.length = 0;  // A többi kapcsolat se kezdjen új darabba
+                        throw error;
                     }
-                } else {
-                    console.log('Upload failed with status:', xhr.status);
-                    bar.className = 'bg-red-600 h-2 rounded-full transition-all duration-300';
-                    document.getElementById(`percent-${progressId}`).textContent = 'Hiba!';
-                    App.showNotification('Hiba a fájl feltöltésekor!', 'error');
+                    inFlight.delete(index);
+                    uploadedBytes += blob.size;
+                    reportProgress();
                 }
+            };
+            const streams = Math.max(1, Math.min(this.uploadConfig.parallel_streams, pending.length));
+            await Promise.all(Array.from({ length: streams }, streamWorker));
+
+            const response = await fetch(`/api/uploads/${session.id}/complete`, { method: 'POST' });
+            if (!response.ok) throw this.uploadError(response.status);
+            localStorage.removeItem(resumeKey);
+        },
+
+        async putChunkWithRetry(uploadId, index, blob, onProgress, maxAttempts = 5) {
+            for (let attempt = 1; ; attempt++) {
+                try {
+                    return await this.putChunk(uploadId, index, blob, onProgress);
+                } catch (error) {
+                    if (attempt >= maxAttempts || error.transient === false) throw error;
+                    console.log(`Chunk ${index} failed (${error.message}), retrying...`);
+                    await new Promise(r => setTimeout(r, 1000 * attempt));
+                }
+            }
+        },
+
+        putChunk(uploadId, index, blob, onProgress) {
+            return new Promise((resolve, reject) => {
+                const xhr = new XMLHttpRequest();
+                xhr.open('PUT', `/api/uploads/${uploadId}/chunks/${index}`, true);
+                xhr.upload.addEventListener('progress', e => onProgress(e.loaded));
+                xhr.addEventListener('load', () => {
+                    if (xhr.status === 200) resolve();
+                    else reject(this.uploadError(xhr.status));
+                });
+                xhr.addEventListener('error', () => reject(this.uploadError(0)));
+                xhr.send(blob);
             });
-            xhr.send(formData);
+        },
+
+        onUploadSuccess(progressId) {
+            const bar = document.getElementById(progressId);
+            const wrapper = document.getElementById(`wrapper-${progressId}`);
+            bar.style.width = '100%';
+            bar.className = 'bg-green-600 h-2 rounded-full transition-all duration-300';
+            this.setProgressLabel(progressId, 'Kész!');
+            setTimeout(() => {
+                wrapper.style.opacity = '0';
+                setTimeout(() => wrapper.remove(), 300);
+            }, 1000);
+            // Élő kapcsolatnál a szerver eseményei frissítik a listát; különben összevontan töltjük újra
+            if (this.hasLiveFileEvents()) return;
+            clearTimeout(this.uploadRefreshTimer);
+            this.uploadRefreshTimer = setTimeout(() => this.refreshFileList(), 1000);
+        },
+
+        onUploadError(progressId, error) {
+            console.log('Upload failed:', error);
+            document.getElementById(progressId).className = 'bg-red-600 h-2 rounded-full transition-all duration-300';
+            this.setProgressLabel(progressId, 'Hiba!');
+        },
+
+        async onUploadQueueDrained(succeeded, failed) {
+            clearTimeout(this.uploadRefreshTimer);
+            // Refresh file list without page reload
+            try {
+                if (!App.hasLiveFileEvents()) await App.refreshFileList();
+                // Update polling state immediately to prevent duplicate notifications
+                await App.updatePollingState();
+            } catch (error) {
+                console.error('Failed to refresh file list after upload:', error);
+            }
+            if (failed) {
+                App.showNotification(`Hiba ${failed} feltöltésnél! (${succeeded} sikeres)`, 'error');
+            } else if (succeeded) {
+                App.showNotification(succeeded === 1 ? 'Fájl sikeresen feltöltve!' : `${succeeded} feltöltés sikeresen befejeződött!`, 'success');
+            }
         },
         
         // --- Segédfüggvények ---
@@ -1276,6 +4215,12 @@ HTML_TEMPLATE = """
                     storageBar.style.width = data.storage_info.used_percent + '%';
                 }
                 
+                // Update physical (deduplicated) size of the upload folder
+                const physicalSpan = document.getElementById('upload-physical-size');
+                if (physicalSpan && data.upload_info) {
+                    physicalSpan.textContent = data.upload_info.physical_size_formatted;
+                }
+                
             } catch (error) {
                 console.log('System monitoring update failed:', error);
             }
@@ -1295,7 +4240,12 @@ HTML_TEMPLATE = """
                 const result = await response.json();
                   if (result.success) {
                     // Remove from files array
+                    const removed = this.files.find(f => f.name === filename);
                     this.files = this.files.filter(f => f.name !== filename);
+                    if (removed) {
+                        this.fileTotals.count--;
+                        this.fileTotals.total_size -= removed.size;
+                    }
                     
                     // Re-render file list
                     this.renderFiles();
@@ -1315,25 +4265,45 @@ HTML_TEMPLATE = """
                 console.error('Delete error:', error);
                 this.showNotification('Hiba történt a fájl törlésekor.', 'error');
             }        },
+        downloadFiltered() {
+            if (this.files.length === 0) {
+                this.showNotification('Nincs letölthető fájl.', 'error');
+                return;
+            }
+            // Sima űrlap-küldés: a böngésző letöltéskezelője közvetlenül lemezre menti a ZIP folyamot.
+            // A szűrőket küldjük, nem a neveket, mert a még be nem töltött oldalak fájljai is kellenek
+            const form = document.createElement('form');
+            form.method = 'POST';
+            form.action = '/download/bulk';
+            form.style.display = 'none';
+            const params = this.fileQueryParams();
+            ['q', 'type'].filter(name => params.has(name)).forEach(name => {
+                const input = document.createElement('input');
+                input.type = 'hidden';
+                input.name = name;
+                input.value = params.get(name);
+                form.appendChild(input);
+            });
+            document.body.appendChild(form);
+            form.submit();
+            form.remove();
+        },
           async refreshFileList() {
             try {
                 console.log('Refreshing file list...');
                 
                 // Fetch updated file list from server
-                const response = await fetch('/api/files');
+                const request = ++this.fileRequest;
+                const response = await fetch(`/api/files?${this.fileQueryParams()}`);
                 if (!response.ok) throw new Error(`HTTP ${response.status}: ${response.statusText}`);
                 
                 const data = await response.json();
                 console.log('Received file data:', data);
+                if (request !== this.fileRequest) return;
                 
-                // Update files array
-                this.files = data.files;
-                
-                // Re-render file list
-                this.renderFiles();
-                
-                // Update upload info in sidebar
-                this.updateUploadInfo();
+                // Első oldal az aktuális rendezéssel és szűrőkkel; a többit görgetéskor töltjük
+                this.dom.scrollContainer.scrollTop = 0;
+                this.applyFilesPage(data, false);
                 
                 console.log('File list refreshed successfully');
                 
@@ -1344,13 +4314,13 @@ HTML_TEMPLATE = """
         },
         
         async updateUploadInfo() {
-            // Recalculate upload folder info
-            const totalSize = this.files.reduce((sum, file) => sum + file.size, 0);
-            const count = this.files.length;
+            // Az összesítők a szervertől jönnek, a kliens csak a betöltött oldalakat látja
+            const totalSize = this.fileTotals.total_size;
+            const count = this.fileTotals.count;
             
             // Update sidebar display
-            const countSpan = document.querySelector('.bg-gray-100.dark\\:bg-gray-800 .space-y-1 .flex:first-child .text-sm.font-medium');
-            const sizeSpan = document.querySelector('.bg-gray-100.dark\\:bg-gray-800 .space-y-1 .flex:last-child .text-sm.font-medium');
+            const countSpan = document.getElementById('upload-count');
+            const sizeSpan = document.getElementById('upload-size');
             
             if (countSpan) countSpan.textContent = count;
             if (sizeSpan) sizeSpan.textContent = this.formatBytes(totalSize);
@@ -1392,17 +4362,22 @@ HTML_TEMPLATE = """
             const i = Math.floor(Math.log(bytes) / Math.log(k));
             return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
         },        // File polling methods for cross-device synchronization
+        // Tartalék: csak akkor fut, ha nincs élő Socket.IO kapcsolat (lásd bindFileEvents)
         startFilePolling() {
+            if (this.pollingInterval) return;
             console.log('Starting file polling for cross-device sync...');
             
             // Initialize current state
             this.updatePollingState();
             
             // Start polling every 10 seconds
-            this.setPollingInterval(10000);
+            this.setPollingInterval(document.hidden ? 30000 : 10000);
             
             // Adjust polling frequency based on page visibility
+            if (this.visibilityHandlerBound) return;
+            this.visibilityHandlerBound = true;
             document.addEventListener('visibilitychange', () => {
+                if (!this.pollingInterval) return;
                 if (document.hidden) {
                     // Slow down polling when page is hidden (30 seconds)
                     this.setPollingInterval(30000);
@@ -1447,24 +4422,124 @@ HTML_TEMPLATE = """
                 
                 const data = await response.json();
                 
-                // Check if files have changed
-                const hasChanges = (
-                    data.last_modified > this.lastModified || 
-                    data.file_count !== this.fileCount
-                );
-                
-                if (hasChanges) {
-                    console.log('File changes detected, refreshing list...');
-                    await this.refreshFileList();
+                // Check if files have changed; az index verziója minden változásnál nő
+                if (data.version !== this.indexVersion) {
+                    console.log('File changes detected, syncing list...');
+                    await this.syncFileChanges();
                     this.lastModified = data.last_modified;
                     this.fileCount = data.file_count;
-                    this.showNotification('Fájlok frissítve más eszközről', 'info');
                 }
             } catch (error) {
                 console.error('Failed to check for file changes:', error);
             }
         },
 
+        hasLiveFileEvents() {
+            return Boolean(this.fileSocket && this.fileSocket.connected);
+        },
+
+        // A szerver a fájlváltozásokat eseményként küldi; a listát helyben javítjuk, teljes letöltés nélkül
+        bindFileEvents(socket) {
+            if (!socket) return;
+            this.fileSocket = socket;
+            socket.on('connect', () => {
+                this.stopFilePolling();
+                // A kapcsolat nélküli időszak változásait egyetlen különbség-lekérdezéssel pótoljuk
+                this.syncFileChanges();
+                // Újrakapcsolódáskor a szerver már nem tud a követésről
+                if (this.textViewer && this.textViewer.following) this.setTextFollowing(this.textViewer, true);
+            });
+            socket.on('disconnect', () => this.startFilePolling());
+            socket.on('file_added', (data) => this.onFileEvent(data, [{ type: 'added', ...data }]));
+            socket.on('file_modified', (data) => this.onFileEvent(data, [{ type: 'modified', ...data }]));
+            socket.on('file_removed', (data) => this.onFileEvent(data, [{ type: 'removed', ...data }]));
+            socket.on('files_changed', (data) => this.onFileEvent(data, data.changes));
+            socket.on('tail_started', (data) => {
+                const viewer = this.followedTextViewer(data);
+                if (viewer) this.resetTextViewer(viewer, data.size);
+            });
+            socket.on('tail_reset', (data) => {
+                const viewer = this.followedTextViewer(data);
+                if (viewer) this.resetTextViewer(viewer, data.size);
+            });
+            socket.on('tail_data', (data) => this.onTailData(data));
+            socket.on('tail_error', (data) => {
+                const viewer = this.followedTextViewer(data);
+                if (!viewer) return;
+                viewer.following = false;
+                viewer.size = null;
+                document.getElementById('text-viewer-follow').checked = false;
+                this.showNotification(`A fájl nem követhető: ${data.error}`, 'error');
+            });
+            socket.on('artifact_ready', (data) => {
+                if (data.type === 'peaks') this.onPeaksReady(data);
+            });
+            if (socket.connected) this.stopFilePolling();
+        },
+
+        onFileEvent(data, changes) {
+            if (data.version <= this.indexVersion) return;
+            if (data.resync) {
+                this.refreshFileList();
+            } else if (data.since !== this.indexVersion) {
+                // Kimaradt esemény: a hiányzó változásokat a verziónk óta kérjük le
+                this.syncFileChanges();
+            } else {
+                this.applyFileChanges(changes, data);
+            }
+        },
+
+        // Csak a legutóbb ismert verzió óta történt változásokat tölti le; ha a szerver naplója
+        // már nem nyúlik vissza eddig, a teljes listát kéri újra
+        syncFileChanges() {
+            if (this.syncPromise) return this.syncPromise;
+            if (this.indexVersion === null) return this.refreshFileList(); // Nincs mihez képest különbséget kérni
+            this.syncPromise = (async () => {
+                try {
+                    const response = await fetch(`/api/files?since=${this.indexVersion}`);
+                    if (!response.ok) throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                    const data = await response.json();
+                    if (data.resync) {
+                        await this.refreshFileList();
+                    } else if (data.version > this.indexVersion) {
+                        this.applyFileChanges(data.changes, data);
+                    }
+                } catch (error) {
+                    console.error('Failed to sync file changes:', error);
+                } finally {
+                    this.syncPromise = null;
+                }
+            })();
+            return this.syncPromise;
+        },
+
+        // Változások beillesztése a betöltött oldalakba; ami a betöltött tartományon túlra esik,
+        // azt majd a következő oldal hozza
+        applyFileChanges(changes, data) {
+            const last = this.files[this.files.length - 1];
+            const changed = new Set(changes.map(change => change.name));
+            this.files = this.files.filter(f => !changed.has(f.name));
+            let added = 0;
+            for (const change of changes) {
+                if (change.type === 'removed') continue;
+                if (change.type === 'added') added++;
+                if (!this.matchesFileQuery(change.file)) continue;
+                if (this.fileCursor && last && this.compareFiles(change.file, last) > 0) continue;
+                this.files.push(change.file);
+            }
+            this.files.sort((a, b) => this.compareFiles(a, b));
+            this.indexVersion = data.version;
+            this.fileTotals = { count: data.count, total_size: data.total_size };
+            this.fileCount = data.count;
+            this.renderFiles();
+            this.updateUploadInfo();
+            // Saját feltöltésnél nem értesítünk, a folyamatjelző már mutatja
+            const uploading = UploadQueue.active > 0 || UploadQueue.pending.length > 0;
+            if (added && !uploading) {
+                this.showNotification(added === 1 ? 'Új fájl érkezett' : `${added} új fájl érkezett`, 'info');
+            }
+        },
+
         stopFilePolling() {
             if (this.pollingInterval) {
                 clearInterval(this.pollingInterval);
@@ -1473,6 +4548,111 @@ HTML_TEMPLATE = """
             }        }
     };
 
+    // Feltöltési sor: korlátozott, az áteresztőképességhez igazodó párhuzamossággal
+    const UploadQueue = {
+        pending: [],
+        active: 0,
+        waiting: 0,
+        concurrency: 3,
+        minConcurrency: 1,
+        maxConcurrency: 8,
+        maxAttempts: 4,
+        sampleInterval: 2000,
+        direction: 1,
+        lastThroughput: 0,
+        sampleBytes: 0,
+        sampleStart: 0,
+        loaded: new Map(),
+        succeeded: 0,
+        failed: 0,
+
+        add(task) {
+            task.attempts = 0;
+            this.pending.push(task);
+            this.pump();
+        },
+
+        pump() {
+            while (this.active < this.concurrency && this.pending.length) {
+                this.start(this.pending.shift());
+            }
+            this.updatePositions();
+        },
+
+        updatePositions() {
+            this.pending.forEach((task, index) => {
+                if (!task.retrying) App.setProgressLabel(task.progressId, `Sorban: ${index + 1}.`);
+            });
+        },
+
+        async start(task) {
+            this.active++;
+            task.retrying = false;
+            App.setProgressLabel(task.progressId, '0%');
+            if (!this.sampleStart) this.sampleStart = performance.now();
+            try {
+                await task.run();
+                this.succeeded++;
+                App.onUploadSuccess(task.progressId);
+            } catch (error) {
+                const transient = error.transient || error instanceof TypeError;
+                if (transient && ++task.attempts < this.maxAttempts) {
+                    // Exponenciális visszalépés véletlen szórással, és kevesebb párhuzamos feltöltés
+                    const delay = Math.min(30000, 1000 * 2 ** task.attempts) * (0.5 + Math.random());
+                    this.concurrency = Math.max(this.minConcurrency, Math.floor(this.concurrency / 2));
+                    task.retrying = true;
+                    this.waiting++;
+                    App.setProgressLabel(task.progressId, `Újra ${Math.ceil(delay / 1000)} mp múlva...`);
+                    setTimeout(() => {
+                        this.waiting--;
+                        this.pending.unshift(task);
+                        this.pump();
+                    }, delay);
+                } else {
+                    this.failed++;
+                    App.onUploadError(task.progressId, error);
+                }
+            } finally {
+                this.loaded.delete(task.progressId);
+                this.active--;
+                this.pump();
+                if (!this.active && !this.pending.length && !this.waiting) this.drain();
+            }
+        },
+
+        drain() {
+            App.onUploadQueueDrained(this.succeeded, this.failed);
+            this.succeeded = 0;
+            this.failed = 0;
+            this.sampleStart = 0;
+            this.sampleBytes = 0;
+        },
+
+        recordProgress(progressId, loaded) {
+            const previous = this.loaded.get(progressId) || 0;
+            if (loaded > previous) this.sampleBytes += loaded - previous;
+            this.loaded.set(progressId, loaded);
+            const now = performance.now();
+            if (now - this.sampleStart >= this.sampleInterval) {
+                this.adapt(this.sampleBytes / ((now - this.sampleStart) / 1000));
+                this.sampleBytes = 0;
+                this.sampleStart = now;
+            }
+        },
+
+        // Hegymászó szabályozás: amíg a több párhuzamos feltöltés gyorsít, arra lépünk tovább
+        adapt(throughput) {
+            const previous = this.lastThroughput;
+            this.lastThroughput = throughput;
+            if (previous) {
+                if (throughput < previous * 0.95) this.direction = -this.direction;  // Romlott: visszafordulunk
+                else if (throughput < previous * 1.05) return;  // Nincs érdemi változás
+            }
+            this.concurrency = Math.min(this.maxConcurrency, Math.max(this.minConcurrency, this.concurrency + this.direction));
+            this.pump();
+        }
+    };
+
     // Chat funkcionalitás
     const Chat = {
         socket: null,
@@ -2166,12 +5346,172 @@ HTML_TEMPLATE = """
         App.init();
         Chat.init();
         Notes.init();
+        App.bindFileEvents(Chat.socket);
     });
 </script>
 </body>
 </html>
 """
 
+# --- Sávszélesség-korlátozás ---
+
+class TokenBucket:
+    """Token bucket that hands out byte budgets; callers sleep off any deficit"""
+
+    def __init__(self, rate):
+        self.lock = threading.Lock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.rate = rate
+            self.capacity = max(rate // 4, BANDWIDTH_QUANTUM)  # Legfeljebb ~250 ms-nyi löket
+            self.tokens = self.capacity
+            self.updated = time.monotonic()
+
+    def reserve(self, amount):
+        """Takes amount tokens (possibly going negative) and returns the seconds to wait"""
+        with self.lock:
+            if self.rate <= 0:
+                return 0
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+class BandwidthShaper:
+    """WSGI middleware that rate-limits bulk transfers per client IP and globally.
+
+    Only downloads and upload bodies are shaped. API calls, Socket.IO and page
+    loads bypass the buckets so they stay responsive while a large transfer runs.
+    Transfers take the budget in BANDWIDTH_QUANTUM slices, so concurrent
+    transfers interleave and share a limit evenly.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.lock = threading.Lock()
+        self.client_buckets = {}  # IP -> TokenBucket
+        self.active = {}  # IP -> futó átvitelek száma
+        self.set_limits(BANDWIDTH_GLOBAL_LIMIT, BANDWIDTH_CLIENT_LIMIT)
+
+    def set_limits(self, global_limit, client_limit):
+        self.global_limit = global_limit
+        self.client_limit = client_limit
+        self.global_bucket = TokenBucket(global_limit)
+        with self.lock:
+            for bucket in self.client_buckets.values():
+                bucket.set_rate(client_limit)
+
+    @property
+    def enabled(self):
+        return self.global_limit > 0 or self.client_limit > 0
+
+    def is_bulk_transfer(self, environ):
+        path, method = environ.get('PATH_INFO', ''), environ.get('REQUEST_METHOD')
+        if path.startswith('/download/') or path.startswith('/files/'):
+            return True
+        if path == '/' and method == 'POST':
+            return True
+        return path.startswith('/api/uploads/') and (method == 'PUT' or path == '/api/uploads/batch')
+
+    def throttle(self, client_bucket, amount):
+        # Előbb a kliens saját kerete, utána a közös; a kettő közül a szigorúbb érvényesül
+        delay = max(client_bucket.reserve(amount), self.global_bucket.reserve(amount))
+        if delay:
+            socketio.sleep(delay)
+
+    def finish_transfer(self, client):
+        with self.lock:
+            self.active[client] -= 1
+            if not self.active[client]:
+                del self.active[client]
+
+    def __call__(self, environ, start_response):
+        if not self.enabled or not self.is_bulk_transfer(environ):
+            return self.wsgi_app(environ, start_response)
+        client = environ.get('REMOTE_ADDR', '')
+        with self.lock:
+            client_bucket = self.client_buckets.get(client)
+            if client_bucket is None:
+                client_bucket = self.client_buckets[client] = TokenBucket(self.client_limit)
+            self.active[client] = self.active.get(client, 0) + 1
+        try:
+            environ['wsgi.input'] = ShapedInput(environ['wsgi.input'], self, client_bucket)
+            body = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self.finish_transfer(client)
+            raise
+        return ShapedBody(body, self, client_bucket, client)
+
+class ShapedBody:
+    """Response iterable that releases bytes to the client at the shaped rate"""
+
+    def __init__(self, body, shaper, client_bucket, client):
+        self.body = body
+        self.shaper = shaper
+        self.client_bucket = client_bucket
+        self.client = client
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.body:
+            for i in range(0, len(chunk), BANDWIDTH_QUANTUM):
+                piece = chunk[i:i + BANDWIDTH_QUANTUM]
+                self.shaper.throttle(self.client_bucket, len(piece))
+                yield piece
+
+    def close(self):
+        # A WSGI szerver akkor is meghívja, ha a választ el sem kezdte küldeni
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            close = getattr(self.body, 'close', None)
+            if close:
+                close()
+        finally:
+            self.shaper.finish_transfer(self.client)
+
+class ShapedInput:
+    """wsgi.input wrapper that charges every read to the client's buckets"""
+
+    def __init__(self, stream, shaper, client_bucket):
+        self.stream = stream
+        self.shaper = shaper
+        self.client_bucket = client_bucket
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > BANDWIDTH_QUANTUM:
+            size = BANDWIDTH_QUANTUM  # Nagy olvasást is szeletekben engedünk át
+        data = self.stream.read(size)
+        if data:
+            self.shaper.throttle(self.client_bucket, len(data))
+        return data
+
+    def readline(self, size=-1):
+        data = self.stream.readline(size)
+        if data:
+            self.shaper.throttle(self.client_bucket, len(data))
+        return data
+
+    def readlines(self, hint=-1):
+        return list(iter(self.readline, b''))
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+bandwidth_shaper = BandwidthShaper(app.wsgi_app)
+app.wsgi_app = bandwidth_shaper
+
+def is_admin_request():
+    """Loopback clients, or anyone presenting ADMIN_TOKEN in X-Admin-Token"""
+    if request.remote_addr in ('127.0.0.1', '::1'):
+        return True
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
 # --- Flask Útvonalak (Routes) ---
 
 @app.route('/', methods=['GET', 'POST'])
@@ -2183,27 +5523,21 @@ def index():
         for file in files:
             if file and file.filename:
                 filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                if not filename:
+                    continue
+                if isinstance(file.stream, StagingFile):
+                    store_upload(file.stream, filename)
+                else:
+                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
         return jsonify({'success': 'Files uploaded successfully'})
 
     try:
-        filenames = os.listdir(app.config['UPLOAD_FOLDER'])
-        files_data = []
-        for name in filenames:
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], name)
-            if os.path.isfile(filepath):
-                stat = os.stat(filepath)
-                preview_type, icon = get_file_info(name)
-                files_data.append({
-                    'name': name,
-                    'size': stat.st_size,
-                    'size_formatted': format_bytes(stat.st_size),
-                    'date': stat.st_mtime,
-                    'date_formatted': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M'),
-                    'preview_type': preview_type,
-                    'icon': icon                })
+        # Csak az első oldal kerül az oldalba, a többit a kliens görgetéskor kéri le
+        files_page = file_index.query('date', descending=True)
+        if files_page['next_cursor'] is not None:
+            files_page['next_cursor'] = encode_file_cursor(files_page['next_cursor'])
     except FileNotFoundError:
-        files_data = []
+        files_page = {'files': [], 'next_cursor': None, 'count': 0, 'total_size': 0, 'version': 0}
 
     server_url = f"http://{get_local_ip()}:{PORT}"
     
@@ -2213,24 +5547,445 @@ def index():
     system_info = get_system_info() or {'cpu_percent': 0, 'memory_percent': 0}
     network_info = get_network_info()
     
+    upload_config = {
+        'chunk_size': CHUNK_SIZE,
+        'chunked_threshold': CHUNKED_UPLOAD_THRESHOLD,
+        'parallel_streams': UPLOAD_PARALLEL_STREAMS,
+        'batch_min_files': BATCH_UPLOAD_MIN_FILES,
+        'batch_max_file_size': BATCH_UPLOAD_MAX_FILE_SIZE,
+        'batch_max_bytes': BATCH_UPLOAD_MAX_BYTES,
+        'precheck_max_size': PRECHECK_MAX_SIZE,
+        'precheck_max_batch': PRECHECK_MAX_BATCH,
+        'preview_widths': PREVIEW_WIDTHS
+    }
+    
     return render_template_string(HTML_TEMPLATE, 
-                                files_json=json.dumps(files_data), 
+                                files_json=json.dumps(files_page), 
+                                upload_config_json=json.dumps(upload_config), 
                                 server_url=server_url,
                                 storage_info=storage_info,
                                 upload_info=upload_info,
                                 system_info=system_info,
                                 network_info=network_info)
 
+@app.route('/api/uploads', methods=['POST'])
+def api_upload_create():
+    """Creates a resumable chunked upload session."""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        filename = secure_filename(data.get('filename', ''))
+        size = data.get('size')
+        if not filename:
+            return jsonify({'error': 'Invalid filename'}), 400
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            return jsonify({'error': 'Invalid size'}), 400
+        # A teljes méret azonnal lefoglalódik a lemezen, ezért a korlátokat előtte ellenőrizzük
+        if size > app.config['MAX_CONTENT_LENGTH']:
+            return jsonify({'error': 'File too large'}), 413
+        if size > shutil.disk_usage(UPLOAD_FOLDER).free:
+            return jsonify({'error': 'Not enough free space'}), 507
+        client = request.remote_addr or ''
+        if count_client_upload_sessions(client) >= UPLOAD_MAX_SESSIONS_PER_CLIENT:
+            return jsonify({'error': 'Too many unfinished uploads'}), 429
+
+        upload_id = uuid.uuid4().hex
+        os.makedirs(get_upload_session_dir(upload_id))
+        # A végleges méretű fájlba a darabok a saját offsetjükre íródnak
+        with open(get_session_data_path(upload_id), 'wb') as f:
+            preallocate_fd(f.fileno(), size)
+        session = {
+            'id': upload_id,
+            'filename': filename,
+            'size': size,
+            'chunk_size': CHUNK_SIZE,
+            'total_chunks': max(1, math.ceil(size / CHUNK_SIZE)),
+            'client': client,
+            'created_at': time.time()
+        }
+        save_upload_session(session)
+        return jsonify({**session, 'received_chunks': []}), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def api_upload_status(upload_id):
+    """Returns which chunks of an upload session are already stored."""
+    session = load_upload_session(upload_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+    received = get_received_chunks(session)
+    received_bytes = sum(get_expected_chunk_size(session, i) for i in received)
+    return jsonify({**session, 'received_chunks': received, 'received_bytes': received_bytes})
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def api_upload_chunk(upload_id, index):
+    """Stores one numbered chunk; the raw request body is the chunk data."""
+    session = load_upload_session(upload_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+    if index < 0 or index >= session['total_chunks']:
+        return jsonify({'error': 'Chunk index out of range'}), 400
+
+    expected = get_expected_chunk_size(session, index)
+    offset = index * session['chunk_size']
+    try:
+        written = 0
+        fd = os.open(get_session_data_path(upload_id), os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            while True:
+                data = request.stream.read(UPLOAD_WRITE_BUFFER)
+                if not data:
+                    break
+                if written + len(data) > expected:
+                    written += len(data)
+                    break
+                write_at(fd, data, offset + written)
+                written += len(data)
+            if written == expected:
+                sync_fd(fd)  # A darab csak tartósan kiírva kerülhet a naplóba
+        finally:
+            os.close(fd)
+        if written != expected:
+            return jsonify({'error': f'Chunk size mismatch: expected {expected} bytes'}), 400
+        # A darab csak teljes beérkezés után kerül a naplóba
+        mark_chunk_received(upload_id, index)
+        return jsonify({'success': True, 'index': index, 'size': written})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def api_upload_complete(upload_id):
+    """Assembles the stored chunks into the final file."""
+    session = load_upload_session(upload_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+    received = get_received_chunks(session)
+    missing = sorted(set(range(session['total_chunks'])) - set(received))
+    if missing:
+        return jsonify({'error': 'Upload incomplete', 'missing_chunks': missing}), 409
+
+    try:
+        # Nincs összefűzés: a darabok már a helyükön vannak, csak átnevezzük. A (akár több GB-os)
+        # fájl hash-elése és deduplikálása a háttérben fut, a kérés nem vár rá
+        store_file(get_session_data_path(upload_id), session['filename'], hash_later=True)
+        shutil.rmtree(get_upload_session_dir(upload_id), ignore_errors=True)
+        return jsonify({'success': True, 'filename': session['filename'], 'size': session['size']})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def api_upload_abort(upload_id):
+    """Aborts an upload session and frees its staged chunks."""
+    session_dir = get_upload_session_dir(upload_id)
+    if not session_dir or not os.path.isdir(session_dir):
+        return jsonify({'error': 'Upload session not found'}), 404
+    shutil.rmtree(session_dir, ignore_errors=True)
+    return jsonify({'success': True})
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+def parse_content_ref(item):
+    """(size, sha256) of a {"size", "sha256"} object, or None if it is malformed"""
+    if not isinstance(item, dict):
+        return None
+    size, digest = item.get('size'), item.get('sha256')
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        return None
+    if not isinstance(digest, str) or not SHA256_RE.match(digest.lower()):
+        return None
+    return size, digest.lower()
+
+@app.route('/api/files/precheck', methods=['POST'])
+def api_files_precheck():
+    """Tells the client which (size, sha256) pairs are already stored on the server."""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        items = data.get('files', [])
+        if not isinstance(items, list) or len(items) > PRECHECK_MAX_BATCH:
+            return jsonify({'error': f'Expected a list of at most {PRECHECK_MAX_BATCH} files'}), 400
+        refs = [parse_content_ref(item) for item in items]
+        if None in refs:
+            return jsonify({'error': 'Each file needs an integer size and a hex sha256',
+                            'index': refs.index(None)}), 400
+        blobs = get_blob_index()['blobs'] if DEDUP_STORAGE else {}
+        results = []
+        for size, digest in refs:
+            exists = (digest in blobs and blobs[digest]['size'] == size) or find_file_by_hash(size, digest) is not None
+            results.append({'size': size, 'sha256': digest, 'exists': exists})
+        return jsonify({'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/files/link', methods=['POST'])
+def api_files_link():
+    """Stores a file under a new name from content the server already has."""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        filename = secure_filename(str(data.get('filename', '')))
+        if not filename:
+            return jsonify({'error': 'Invalid filename'}), 400
+        ref = parse_content_ref(data)
+        if ref is None:
+            return jsonify({'error': 'Invalid size or sha256'}), 400
+        size, digest = ref
+        if not link_existing_content(size, digest, filename):
+            return jsonify({'error': 'Content not found'}), 404
+        return jsonify({'success': True, 'filename': filename, 'size': size}), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/batch', methods=['POST'])
+def api_upload_batch():
+    """Extracts a tar stream on the fly into UPLOAD_FOLDER; many small files in one request."""
+    stored = []
+    try:
+        # Streaming mód ('r|*'): nincs köztes archívum a lemezen, a tagok sorban érkeznek
+        with hold_file_events(), tarfile.open(fileobj=request.stream, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                filename = secure_filename(member.name)
+                if not filename:
+                    continue
+                staging = StagingFile()
+                try:
+                    shutil.copyfileobj(archive.extractfile(member), staging, UPLOAD_WRITE_BUFFER)
+                    store_upload(staging, filename)
+                finally:
+                    staging.close()
+                stored.append(filename)
+    except tarfile.TarError as e:
+        return jsonify({'error': f'Invalid tar stream: {e}', 'files': stored}), 400
+    except Exception as e:
+        return jsonify({'error': str(e), 'files': stored}), 500
+    return jsonify({'success': True, 'count': len(stored), 'files': stored})
+
+@app.route('/files/<path:filename>', methods=['PUT'])
+def put_file(filename):
+    """Raw-body upload for scripts: curl -T file http://host:5000/files/name"""
+    safe_filename = secure_filename(filename)
+    if not safe_filename:
+        return jsonify({'error': 'Invalid filename'}), 400
+
+    # Minden ellenőrzés a törzs olvasása előtt történik. gevent módban a 100 Continue csak az első
+    # olvasáskor megy ki, így az Expect: 100-continue fejlécet küldő kliens elutasításkor el sem kezdi
+    # a küldést. A threading mód (Werkzeug) a 100 Continue-t még az alkalmazás hívása előtt elküldi,
+    # ott a törzs elutasításkor is átjön, csak eldobjuk.
+    content_length = request.content_length
+    if content_length is not None:
+        if content_length > app.config['MAX_CONTENT_LENGTH']:
+            return jsonify({'error': 'File too large'}), 413
+        if content_length > shutil.disk_usage(app.config['UPLOAD_FOLDER']).free:
+            return jsonify({'error': 'Not enough free space'}), 507
+
+    staging = StagingFile()
+    try:
+        if content_length:
+            staging.preallocate(content_length)
+        while True:
+            data = request.stream.read(UPLOAD_WRITE_BUFFER)
+            if not data:
+                break
+            staging.write(data)
+        if content_length is not None and staging.size != content_length:
+            return jsonify({'error': f'Incomplete body: received {staging.size} of {content_length} bytes'}), 400
+        store_upload(staging, safe_filename)
+        return jsonify({
+            'success': True,
+            'filename': safe_filename,
+            'size': staging.size,
+            'sha256': staging.sha256
+        }), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        staging.close()
+
+@app.route('/api/admin/bandwidth', methods=['GET', 'PUT'])
+def api_admin_bandwidth():
+    """Reads or changes the bandwidth limits at runtime (bytes/s, 0 = unlimited)."""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'PUT':
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        limits = {
+            'global_limit': data.get('global_limit', bandwidth_shaper.global_limit),
+            'client_limit': data.get('client_limit', bandwidth_shaper.client_limit)
+        }
+        if not all(isinstance(v, int) and not isinstance(v, bool) and v >= 0 for v in limits.values()):
+            return jsonify({'error': 'Limits must be non-negative integers (bytes/s)'}), 400
+        bandwidth_shaper.set_limits(limits['global_limit'], limits['client_limit'])
+    with bandwidth_shaper.lock:
+        active = dict(bandwidth_shaper.active)
+    return jsonify({
+        'global_limit': bandwidth_shaper.global_limit,
+        'client_limit': bandwidth_shaper.client_limit,
+        'enabled': bandwidth_shaper.enabled,
+        'active_transfers': active
+    })
+
+@app.route('/api/jobs')
+def api_jobs():
+    """API endpoint for background job state."""
+    with jobs_lock:
+        active = sorted(jobs.values(), key=lambda j: j['created_at'])
+        return jsonify({'jobs': active, 'recent': job_history[-50:]})
+
 @app.route('/download/<path:filename>')
 def download_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+    if is_hidden_path(filename):
+        abort(404)  # A darabolt feltöltések és a deduplikált tárhely nem tölthető le
+    path = safe_join(os.path.abspath(app.config['UPLOAD_FOLDER']), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    stat = os.stat(path)
+    etag, is_strong = get_file_etag(filename, stat)
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+
+    # A tartománykéréseket magunk szolgáljuk ki (egyetlen tartományt is, hogy zero-copy maradjon)
+    byte_ranges = parse_byte_ranges(request.headers.get('Range')) if request.method == 'GET' else None
+    use_ranges = byte_ranges is not None and len(byte_ranges) <= DOWNLOAD_MAX_RANGES
+    # Szöveges fájl tömörítve, ha a kliens elfogadja; a tartománykérések a tömörítetlen tartalomra vonatkoznak
+    compressible = is_compressible(filename)
+    encoding = None
+    if compressible and 'Range' not in request.headers and stat.st_size >= COMPRESS_MIN_SIZE:
+        encoding = negotiate_encoding()
+    if encoding:
+        etag = f'{etag}-{encoding}'  # Minden kódolt változatnak saját validátora van
+    if (use_ranges or encoding) and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    elif encoding:
+        response = send_compressed_file(path, filename, stat, encoding)
+    elif use_ranges and if_range_matches(etag, is_strong, last_modified):
+        ranges = resolve_byte_ranges(byte_ranges, stat.st_size)
+        if not ranges:
+            return Response(status=416, headers={'Content-Range': f'bytes */{stat.st_size}'})
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_byte_ranges(path, ranges, stat.st_size, mimetype)
+    else:
+        response = send_file(path, as_attachment=True, conditional=False, etag=False, last_modified=last_modified)
+    response.set_etag(etag, weak=not is_strong)
+    response.last_modified = last_modified
+    response.accept_ranges = 'bytes'
+    response.cache_control.no_cache = True  # Mindig újraellenőriz, de 304 esetén nem tölt le újra
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    if response.status_code in (206, 304) or encoding:
+        return response  # A 304-et már eldöntöttük; a make_conditional pufferelné a tömörített folyamot
+    # complete_length nélkül a werkzeug nem dolgozza fel újra a Range fejlécet
+    return response.make_conditional(request, accept_ranges=True)
+
+@app.route('/download/bulk', methods=['POST'])
+def download_bulk():
+    """Streams the selected files (or every file) as one ZIP; accepts JSON or form data."""
+    data = request.get_json(silent=True) or {}
+    requested = data.get('files') if request.is_json else request.form.getlist('files')
+    if requested:
+        names = dict.fromkeys(secure_filename(str(name)) for name in requested if not is_hidden_path(str(name)))
+    else:
+        # Fájllista nélkül a lista szűrői (q, type) szerint, ezek hiányában minden fájl
+        source = data if request.is_json else request.form
+        preview_type = source.get('type') or None
+        if preview_type is not None and preview_type not in PREVIEW_TYPES:
+            return jsonify({'error': 'Invalid type'}), 400
+        names = file_index.matching_names(source.get('q'), preview_type)
+    filenames = [name for name in names if name and os.path.isfile(os.path.join(app.config['UPLOAD_FOLDER'], name))]
+    if not filenames:
+        return jsonify({'error': 'No files to download'}), 404
+
+    archive_name = f"dropflow-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip"
+    response = Response(generate_zip_stream(filenames), mimetype='application/zip')
+    set_attachment_header(response, archive_name)
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/thumb/<path:filename>')
+def thumbnail(filename):
+    """Downscaled image: /thumb/<name>?w=<px>; WebP if the client accepts it, JPEG otherwise.
+    With ?v=<mtime> the response is cached by the browser for good (the URL changes with the file)."""
+    if is_hidden_path(filename):
+        abort(404)
+    safe_filename = secure_filename(filename)
+    path = os.path.join(app.config['UPLOAD_FOLDER'], safe_filename)
+    if not safe_filename or not os.path.isfile(path):
+        abort(404)
+    if not is_thumbnailable(safe_filename):
+        if get_file_info(safe_filename)[0] == 'image':
+            return redirect(url_for('download_file', filename=safe_filename))
+        return jsonify({'error': 'Thumbnail not available for this file type'}), 400
+    width = get_thumb_bucket(request.args.get('w', THUMB_PREGENERATE_WIDTH, type=int))
+    try:
+        if run_blocking(is_original_better, path, width):
+            return redirect(url_for('download_file', filename=safe_filename))
+    except (OSError, Image.DecompressionBombError) as e:
+        return jsonify({'error': f'Cannot create thumbnail: {e}'}), 415
+    accepts_webp = any(mimetype == 'image/webp' and quality > 0 for mimetype, quality in request.accept_mimetypes)
+    fmt = 'webp' if accepts_webp and 'webp' in get_thumb_formats() else 'jpeg'
+    stat = os.stat(path)
+    try:
+        thumb_path = run_blocking(get_thumbnail, safe_filename, stat, width, fmt)
+    except (OSError, Image.DecompressionBombError) as e:
+        return jsonify({'error': f'Cannot create thumbnail: {e}'}), 415
+    # A gyorsítótár-fájl mtime-ja az LRU-hoz változik, ezért a validátorok a forrásfájlból jönnek
+    response = send_file(os.path.abspath(thumb_path), mimetype=THUMB_MIMETYPES[fmt], conditional=True,
+                         etag=os.path.basename(thumb_path), last_modified=stat.st_mtime)
+    response.vary.add('Accept')
+    if request.args.get('v'):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/peaks/<path:filename>')
+def waveform_peaks(filename):
+    """Precomputed waveform of an audio file: {"duration": s, "peaks": [0..1, ...]}.
+    Small files are computed on the spot; larger ones get a background job and 202 until it is
+    done (an artifact_ready event with type "peaks" follows). 415 if no decoder handles the format."""
+    if is_hidden_path(filename):
+        abort(404)
+    safe_filename = secure_filename(filename)
+    path = os.path.join(app.config['UPLOAD_FOLDER'], safe_filename)
+    if not safe_filename or not os.path.isfile(path):
+        abort(404)
+    if get_file_info(safe_filename)[0] != 'audio':
+        return jsonify({'error': 'Waveform not available for this file type'}), 400
+    if not has_peak_decoder(safe_filename):
+        return jsonify({'error': 'No decoder available for this audio format'}), 415
+    stat = os.stat(path)
+    peaks_path = get_peaks_path(safe_filename, stat)
+    if not os.path.exists(peaks_path):
+        if stat.st_size > PEAKS_SYNC_MAX:
+            job = enqueue_job('peaks', safe_filename)
+            return jsonify({'status': 'pending', 'job': job and job['id']}), 202
+        try:
+            run_blocking(write_peaks, path, peaks_path)
+        except ValueError as e:
+            return jsonify({'error': f'Cannot decode audio: {e}'}), 415
+    response = send_file(os.path.abspath(peaks_path), mimetype='application/json', conditional=True,
+                         etag=os.path.basename(peaks_path), last_modified=stat.st_mtime)
+    if request.args.get('v'):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/delete/<path:filename>', methods=['DELETE'])
 def delete_file(filename):
+    if is_hidden_path(filename):
+        abort(404)
     try:
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        safe_filename = secure_filename(filename)
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], safe_filename)
+        if safe_filename and os.path.isfile(file_path):
+            remove_upload(safe_filename)
             return jsonify({'success': True, 'message': 'Fájl sikeresen törölve'})
         else:
             return jsonify({'success': False, 'error': 'Fájl nem található'}), 404
@@ -2241,10 +5996,14 @@ def delete_file(filename):
 @app.route('/preview/<path:filename>')
 def preview_file(filename):
     """Visszaadja a szöveges fájlok tartalmát JSON-ként az előnézethez."""
+    if is_hidden_path(filename):
+        abort(404)
     safe_filename = secure_filename(filename)
     preview_type, _ = get_file_info(safe_filename)
     if preview_type not in ['code']:
         return jsonify({'error': 'Preview not available for this file type'}), 400
+    if 'from_line' in request.args or 'count' in request.args:
+        return preview_window(safe_filename)
     
     try:
         with open(os.path.join(app.config['UPLOAD_FOLDER'], safe_filename), 'r', encoding='utf-8', errors='ignore') as f:
@@ -2253,6 +6012,25 @@ def preview_file(filename):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def preview_window(filename):
+    """Window of a text file: ?from_line=<1-based>&count=<n>[&until=<bytes>].
+    Returns {"from_line", "lines", "truncated" (line numbers cut at PREVIEW_LINE_MAX_BYTES),
+    "total_lines", "size", "ends_with_newline"}."""
+    path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if not filename or not os.path.isfile(path):
+        return jsonify({'error': 'File not found'}), 404
+    from_line = max(request.args.get('from_line', 1, type=int), 1)
+    count = min(max(request.args.get('count', PREVIEW_WINDOW_LINES, type=int), 0), PREVIEW_MAX_LINES)
+    until = request.args.get('until', type=int)
+    try:
+        window = run_blocking(read_text_window, path, filename, from_line - 1, count,
+                              None if until is None else max(until, 0))
+    except OSError as e:
+        return jsonify({'error': str(e)}), 500
+    response = jsonify({'from_line': from_line, **window})
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/qr_code')
 def qr_code_img():
     """Generál egy QR kódot a szerver címéből."""
@@ -2282,63 +6060,72 @@ def api_system_info():
 
 @app.route('/api/files')
 def api_files():
-    """API endpoint to get current file list."""
+    """API endpoint to get current file list; ?since=<version> returns only the changes after it.
+
+    With any of sort/q/type/cursor/limit the list is paged: sort=<name|size|date|type>_<asc|desc>,
+    q filters by name, type by preview type, and next_cursor fetches the following page.
+    """
     try:
-        filenames = os.listdir(app.config['UPLOAD_FOLDER'])
-        files_data = []
-        for name in filenames:
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], name)
-            if os.path.isfile(filepath):
-                stat = os.stat(filepath)
-                preview_type, icon = get_file_info(name)
-                files_data.append({
-                    'name': name,
-                    'size': stat.st_size,
-                    'size_formatted': format_bytes(stat.st_size),
-                    'date': stat.st_mtime,
-                    'date_formatted': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M'),
-                    'preview_type': preview_type,
-                    'icon': icon                })
-        
-        return jsonify({
-            'files': files_data,
-            'count': len(files_data),
-            'total_size': sum(f['size'] for f in files_data)
-        })
+        if PAGED_FILE_ARGS.intersection(request.args):
+            return api_files_page()
+        if 'since' in request.args:
+            since = request.args.get('since', type=int)
+            if since is None:
+                return jsonify({'error': 'Invalid since'}), 400
+            version, changes = file_index.changes_since(since)
+            summary = file_index.summary()
+            if changes is None:
+                return jsonify({'resync': True, 'since': since, 'version': version})
+            return jsonify({
+                'since': since,
+                'version': version,
+                'changes': changes,
+                'count': summary['count'],
+                'total_size': summary['total_size']
+            })
+        return Response(file_index.files_payload(), mimetype='application/json')
     except FileNotFoundError:
         return jsonify({'files': [], 'count': 0, 'total_size': 0})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+PAGED_FILE_ARGS = {'sort', 'q', 'type', 'cursor', 'limit'}
+
+def api_files_page():
+    sort, _, direction = request.args.get('sort', 'date_desc').partition('_')
+    if sort not in FileIndex.SORT_KEYS or direction not in ('asc', 'desc'):
+        return jsonify({'error': 'Invalid sort'}), 400
+    preview_type = request.args.get('type') or None
+    if preview_type is not None and preview_type not in PREVIEW_TYPES:
+        return jsonify({'error': 'Invalid type'}), 400
+    limit = min(max(request.args.get('limit', FILE_PAGE_SIZE, type=int), 1), FILE_PAGE_MAX)
+    cursor = request.args.get('cursor')
+    try:
+        cursor = decode_file_cursor(cursor, sort) if cursor else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    page = file_index.query(sort, direction == 'desc', request.args.get('q'), preview_type, cursor, limit)
+    if page['next_cursor'] is not None:
+        page['next_cursor'] = encode_file_cursor(page['next_cursor'])
+    return jsonify(page)
+
 @app.route('/api/files/check')
 def api_files_check():
     """API endpoint to check for file changes (for polling)."""
     try:
-        upload_folder = app.config['UPLOAD_FOLDER']
-        if not os.path.exists(upload_folder):
-            return jsonify({
-                'last_modified': 0,
-                'file_count': 0,
-                'has_changes': False
-            })
-        
-        # Get the latest modification time in the upload folder
-        latest_time = 0
-        file_count = 0
-        
-        for filename in os.listdir(upload_folder):
-            filepath = os.path.join(upload_folder, filename)
-            if os.path.isfile(filepath):
-                file_count += 1
-                mtime = os.path.getmtime(filepath)
-                if mtime > latest_time:
-                    latest_time = mtime
-        
+        summary = file_index.summary()
         return jsonify({
-            'last_modified': latest_time,
-            'file_count': file_count,
+            'last_modified': summary['last_modified'],
+            'file_count': summary['count'],
+            'version': summary['version'],
             'timestamp': datetime.now().isoformat()
         })
+    except FileNotFoundError:
+        return jsonify({
+            'last_modified': 0,
+            'file_count': 0,
+            'has_changes': False
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2444,6 +6231,71 @@ def api_notes_saved_delete(note_id):
         return jsonify({'error': str(e)}), 500
 
 # --- Szerver Indítása ---
+
+class SendfileWrapper:
+    """wsgi.file_wrapper of the gevent server; marks bodies it can send with os.sendfile"""
+
+    def __init__(self, file, buffer_size=8192, length=None):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.length = length  # Tartománynál ennyi bájt a jelenlegi pozíciótól; None: a fájl végéig
+
+    def __iter__(self):
+        if self.length is None:
+            yield from iter(lambda: self.file.read(self.buffer_size), b'')
+            return
+        # Ha nem a sendfile ágon megy ki (pl. sávszélesség-korlátozás), a tartomány végén meg kell állni
+        remaining = self.length
+        while remaining > 0:
+            block = self.file.read(min(self.buffer_size, remaining))
+            if not block:
+                return
+            remaining -= len(block)
+            yield block
+
+    def close(self):
+        self.file.close()
+
+def run_gevent_server(host, port):
+    """Production server: a greenlet per connection and zero-copy file downloads"""
+    from gevent import pywsgi
+    from gevent.socket import wait_write
+    try:
+        from geventwebsocket.handler import WebSocketHandler as BaseHandler
+    except ImportError:
+        BaseHandler = pywsgi.WSGIHandler  # WebSocket a simple-websocket csomagon keresztül
+
+    class SendfileHandler(BaseHandler):
+        def get_environ(self):
+            environ = super().get_environ()
+            environ['wsgi.file_wrapper'] = SendfileWrapper
+            return environ
+
+        def process_result(self):
+            body = self.result
+            if not isinstance(body, SendfileWrapper) or self.provided_content_length is None or not hasattr(os, 'sendfile'):
+                return super().process_result()
+            # Content-Length bájt az aktuális fájlpozíciótól, a kernel másol lemezről a socketre
+            remaining = int(self.provided_content_length)
+            offset = body.file.tell()
+            self.write(b'')  # Fejlécek
+            out_fd, in_fd = self.socket.fileno(), body.file.fileno()
+            while remaining > 0:
+                try:
+                    sent = os.sendfile(out_fd, in_fd, offset, remaining)
+                except BlockingIOError:
+                    wait_write(out_fd)
+                    continue
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+                self.response_length += sent
+
+    server = pywsgi.WSGIServer((host, port), app, handler_class=SendfileHandler, log=None)
+    server.serve_forever()
+
+
 if __name__ == '__main__':
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER)
@@ -2451,6 +6303,15 @@ if __name__ == '__main__':
     if not os.path.exists(DATA_FOLDER):
         os.makedirs(DATA_FOLDER)
     
+    os.makedirs(STAGING_FOLDER, exist_ok=True)
+    psutil.cpu_percent(interval=None)  # Az első nem blokkoló mérés kiindulópontja
+    socketio.start_background_task(upload_cleanup_worker)
+    socketio.start_background_task(hash_index_flush_worker)
+    socketio.start_background_task(job_dispatcher_worker)
+    socketio.start_background_task(file_index_watcher)
+    socketio.start_background_task(file_events_worker)
+    socketio.start_background_task(tail_worker)
+    
     local_ip = get_local_ip()
     print("*" * 60)
     print("  DropFlow - elindult!")
@@ -2458,7 +6319,11 @@ if __name__ == '__main__':
     print(f"  -> http://{local_ip}:{PORT}")
     print("  Chat funkció engedélyezve!")
     print("  Jegyzetfüzet funkció engedélyezve!")
+    print(f"  Szerver mód: {SERVER_MODE}")
     print("*" * 60)
     
     # SocketIO szerver indítása
-    socketio.run(app, host='0.0.0.0', port=PORT, debug=False, allow_unsafe_werkzeug=True)
+    if SERVER_MODE == 'gevent':
+        run_gevent_server('0.0.0.0', PORT)
+    else:
+        socketio.run(app, host='0.0.0.0', port=PORT, debug=False, allow_unsafe_werkzeug=True)
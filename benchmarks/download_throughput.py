@@ -0,0 +1,105 @@
+"""Download throughput and server CPU cost of each SERVER_MODE.
+
+Starts app_clean.py in a scratch directory once per mode, stores a test file,
+then downloads it over several concurrent connections and reports the
+aggregate throughput and the CPU time the server process spent on it.
+
+    python benchmarks/download_throughput.py --size 512 --connections 8 --rounds 4
+"""
+import argparse
+import http.client
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app_clean.py')
+PORT = 5000
+
+
+def wait_for_server(proc, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit('server exited during startup')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=1)
+            conn.request('GET', '/api/files')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('server did not start')
+
+
+def download(path, rounds, block, results, index):
+    received = 0
+    conn = http.client.HTTPConnection('127.0.0.1', PORT)
+    for _ in range(rounds):
+        conn.request('GET', path)
+        response = conn.getresponse()
+        while True:
+            data = response.read(block)
+            if not data:
+                break
+            received += len(data)
+    conn.close()
+    results[index] = received
+
+
+def run_mode(mode, size, connections, rounds):
+    base = tempfile.mkdtemp(prefix='dropflow-bench-')
+    os.makedirs(os.path.join(base, 'uploads'))
+    with open(os.path.join(base, 'uploads', 'bench.bin'), 'wb') as f:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(size):
+            f.write(chunk)
+    env = dict(os.environ, DROPFLOW_SERVER=mode)
+    proc = subprocess.Popen([sys.executable, APP], cwd=base, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(proc)
+        # Egy bemelegítő letöltés: a fájl a page cache-be kerül, az ETag kiszámolódik
+        download('/download/bench.bin', 1, 1024 * 1024, [0], 0)
+        server = psutil.Process(proc.pid)
+        cpu_before = sum(server.cpu_times()[:2])
+        results = [0] * connections
+        threads = [threading.Thread(target=download, args=('/download/bench.bin', rounds, 1024 * 1024, results, i))
+                   for i in range(connections)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        cpu = sum(server.cpu_times()[:2]) - cpu_before
+        total_mb = sum(results) / (1024 * 1024)
+        return total_mb, elapsed, cpu
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=256, help='test file size in MB')
+    parser.add_argument('--connections', type=int, default=8, help='concurrent downloads')
+    parser.add_argument('--rounds', type=int, default=4, help='downloads per connection')
+    parser.add_argument('--modes', default='threading,gevent', help='comma separated SERVER_MODE values')
+    args = parser.parse_args()
+
+    print(f'{args.connections} connections x {args.rounds} downloads of {args.size} MB from 127.0.0.1:{PORT}')
+    print(f'{"mode":<10} {"MB/s":>8} {"server CPU s":>13} {"CPU s/GB":>9}')
+    for mode in args.modes.split(','):
+        total_mb, elapsed, cpu = run_mode(mode, args.size, args.connections, args.rounds)
+        print(f'{mode:<10} {total_mb / elapsed:>8.0f} {cpu:>13.2f} {cpu / (total_mb / 1024):>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Upload write throughput for each UPLOAD_DURABILITY profile.
+
+Runs the server's own write path (StagingFile -> store_file) against a
+scratch directory, so the numbers include hashing, preallocation, fsync and
+the final rename. Point --dir at the volume the uploads live on; tmpfs or an
+overlay filesystem will hide most of the fsync cost.
+
+    python benchmarks/upload_durability.py --dir /srv/dropflow-scratch
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROFILES = ('none', 'fsync', 'fsync_dir')
+
+
+def run_profile(app, profile, files, size, block, buffer_size, preallocate):
+    app.UPLOAD_DURABILITY = profile
+    app.UPLOAD_WRITE_BUFFER = buffer_size
+    payload = os.urandom(block)
+    start = time.perf_counter()
+    for i in range(files):
+        staging = app.StagingFile()
+        try:
+            if preallocate:
+                staging.preallocate(size)
+            remaining = size
+            while remaining > 0:
+                data = payload[:min(block, remaining)]
+                staging.write(data)
+                remaining -= len(data)
+            app.store_upload(staging, f'bench-{profile}-{i}.bin')
+        finally:
+            staging.close()
+    elapsed = time.perf_counter() - start
+    for i in range(files):
+        app.remove_upload(f'bench-{profile}-{i}.bin')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', help='scratch directory on the target volume (default: a new temp dir)')
+    parser.add_argument('--files', type=int, default=20, help='files written per profile')
+    parser.add_argument('--size', type=float, default=64, help='file size in MB')
+    parser.add_argument('--block', type=int, default=1024 * 1024, help='bytes per write() call')
+    parser.add_argument('--buffer', type=int, default=1024 * 1024, help='UPLOAD_WRITE_BUFFER in bytes')
+    parser.add_argument('--no-preallocate', action='store_true', help='skip posix_fallocate')
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='comma separated profiles to run')
+    args = parser.parse_args()
+
+    base = tempfile.mkdtemp(prefix='dropflow-bench-', dir=args.dir)
+    os.makedirs(os.path.join(base, 'uploads'))
+    os.makedirs(os.path.join(base, 'data'))
+    # Az alkalmazás relatív útvonalakat használ, ezért a scratch könyvtárból importáljuk
+    os.chdir(base)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    import app_clean as app
+    app.job_types.clear()  # A háttérfeladatok nem futnak, ne is gyűljenek
+
+    size = int(args.size * 1024 * 1024)
+    total_mb = args.files * size / (1024 * 1024)
+    print(f'{args.files} x {args.size:g} MB, write block {args.block} B, buffer {args.buffer} B, '
+          f'preallocate {"off" if args.no_preallocate else "on"}, dir {base}')
+    print(f'{"profile":<10} {"seconds":>8} {"MB/s":>8} {"files/s":>8}')
+    try:
+        for profile in args.profiles.split(','):
+            elapsed = run_profile(app, profile, args.files, size, args.block, args.buffer, not args.no_preallocate)
+            print(f'{profile:<10} {elapsed:>8.2f} {total_mb / elapsed:>8.1f} {args.files / elapsed:>8.1f}')
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()